@@ -1,77 +1,326 @@
+import os
 
-from flask import Flask, render_template, request
-import pandas as pd
-import random
+import numpy as np
+from flask import Flask, Response, jsonify, render_template, request
+
+from combo_index import find_combination, generate_unique_combinations, lookup_combinations
+from combo_pool import CombinationPool
+from cooccurrence import get_cooccurrence, parse_date
+from draw_store import get_store
+from entries import evaluate_entry, is_entry_text, parse_entry
+from http_cache import RenderCache, conditional, init_compression, init_request_metrics
+from metrics import CONTENT_TYPE, REGISTRY, Counter
+from number_stats import DEFAULT_WINDOW, get_stats
+from partial_search import find_partial_matches
+from prize_checker import check_tickets, parse_tickets, validate_tickets
+from simulate import DEFAULT_HORIZON, simulate
 
 app = Flask(__name__)
+init_request_metrics(app)
+init_compression(app)
+# Landing page and last-draw fragment, re-rendered only when the data changes
+page_cache = RenderCache()
+
+PAGE_CACHE_LOOKUPS = Counter('mark6_page_cache_lookups_total', 'Rendered page cache lookups.', ['result'])
+PAGE_CACHE_LOOKUPS.set_function(lambda: page_cache.hits, result='hit')
+PAGE_CACHE_LOOKUPS.set_function(lambda: page_cache.misses, result='miss')
+Counter('mark6_page_render_seconds_total', 'Time spent rendering cached pages.').set_function(
+    lambda: page_cache.render_seconds)
+
+MAX_GENERATE_COUNT = 1000
+MAX_PARTIAL_RESULTS = 200
+MAX_CHECK_TICKETS = 20000
+MAX_SEARCH_COMBINATIONS = 100000
+MAX_PAGE_SIZE = 500
+# Lines in one multiple or banker entry; a 49-number multiple is every combination
+MAX_ENTRY_LINES = 1000000
+# Simulations run in the request thread; the cap keeps one under ~50 ms
+DEFAULT_SIMULATED_DRAWS = 100000
+MAX_SIMULATED_DRAWS = 200000
+
+# Browsers revalidate after a minute; edge caches hold responses longer and
+# are purged on every deploy. A past draw never changes.
+LIVE_CACHE_CONTROL = 'public, max-age=60, s-maxage=3600, stale-while-revalidate=86400'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=86400, s-maxage=31536000'
+
+CSV_PATH = os.environ.get('MARK6_CSV_PATH', 'merged_results.csv')
 
 def load_data():
-    return pd.read_csv('merged_results.csv')
+    return get_store(CSV_PATH).load()
+
+# Map the history at startup rather than on the first request
+load_data()
+
+# Never-drawn combinations ready for /generate, topped up in the background
+combination_pool = CombinationPool(load_data, size=2 * MAX_GENERATE_COUNT, name='web')
+
+@app.before_request
+def start_combination_pool():
+    # Started per worker on its first request; a thread started at import would
+    # live only in the pre-fork master
+    combination_pool.start()
+
+def data_version():
+    return load_data().source_hash
 
-def get_latest_draw(df):
-    if df is None or df.empty:
+def draw_key(draw_number):
+    # Stored draw numbers are not consistently zero-padded ('25/067', '26/4')
+    year, _, number = draw_number.partition('/')
+    return (int(year), int(number))
+
+def build_draw_rows(history):
+    rows = {}
+    for i, draw_number in enumerate(history.draw_numbers):
+        try:
+            rows.setdefault(draw_key(draw_number), i)
+        except ValueError:
+            continue
+    return rows
+
+def find_draw_row(history, year, number):
+    return history.derived('draw_rows', build_draw_rows).get((year % 100, number))
+
+def get_latest_draw(history):
+    if history is None or history.empty:
         return None
-    row = df.iloc[0]
-    numbers = [row['num_1'], row['num_2'], row['num_3'], row['num_4'], row['num_5'], row['num_6']]
-    return {
-        'date': row['date'],
-        'draw_number': row['draw_number'],
-        'numbers': numbers,
-        'bonus': row['bonus']
-    }
-
-def generate_unique_combination(df):
-    existing_combinations = set()
-    for _, row in df.iterrows():
-        combination = tuple(sorted([row['num_1'], row['num_2'], row['num_3'], row['num_4'], row['num_5'], row['num_6']]))
-        existing_combinations.add(combination)
-
-    while True:
-        new_combination = tuple(sorted(random.sample(range(1, 50), 6)))
-        if new_combination not in existing_combinations:
-            return list(new_combination)
+    return history.latest()
+
+def render_page(history, **context):
+    last_draw_html = page_cache.get(
+        'last_draw', history.source_hash,
+        lambda: render_template('_last_draw.html', last_draw=get_latest_draw(history)),
+    )
+    return render_template('index.html', last_draw_html=last_draw_html, **context)
 
 @app.route('/')
+@conditional(data_version, LIVE_CACHE_CONTROL)
 def index():
-    df = load_data()
-    last_draw = get_latest_draw(df)
-    return render_template('index.html', last_draw=last_draw)
+    history = load_data()
+    return page_cache.get('index', history.source_hash, lambda: render_page(history))
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(version=data_version(), pages=page_cache.stats(), combinations=combination_pool.stats())
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
 
 @app.route('/generate')
 def generate():
-    df = load_data()
-    new_combination = generate_unique_combination(df)
-    last_draw = get_latest_draw(df)
-    return render_template('index.html', new_combination=new_combination, last_draw=last_draw)
+    history = load_data()
+    count = request.args.get('count', default=1, type=int)
+    if count < 1 or count > MAX_GENERATE_COUNT:
+        return render_page(history, error=f"Count must be between 1 and {MAX_GENERATE_COUNT}.")
+    if request.args.get('distinct', default='1') == '0':
+        combinations = generate_unique_combinations(history, count, distinct=False).tolist()
+    else:
+        combinations = combination_pool.take(history, count)
+    if count == 1:
+        return render_page(history, new_combination=combinations[0])
+    return render_page(history, new_combinations=combinations)
 
 @app.route('/search', methods=['POST'])
 def search():
-    df = load_data()
-    last_draw = get_latest_draw(df)
+    history = load_data()
     
+    numbers_str = request.form.get('numbers') or ''
+    if is_entry_text(numbers_str):
+        return search_entry(history, numbers_str)
     try:
-        numbers_str = request.form.get('numbers')
         numbers = sorted([int(n.strip()) for n in numbers_str.split(',')])
         if len(numbers) != 6:
-            return render_template('index.html', error="Please enter exactly 6 numbers.", last_draw=last_draw)
+            return render_page(history, error="Please enter exactly 6 numbers.")
     except (ValueError, AttributeError):
-        return render_template('index.html', error="Invalid input. Please enter 6 comma-separated numbers.", last_draw=last_draw)
+        return render_page(history, error="Invalid input. Please enter 6 comma-separated numbers.")
 
-    search_combination = tuple(numbers)
-    
-    found = None
-    for index, row in df.iterrows():
-        combination = tuple(sorted([row['num_1'], row['num_2'], row['num_3'], row['num_4'], row['num_5'], row['num_6']]))
-        if combination == search_combination:
-            found = {
-                'date': row['date'],
-                'draw_number': row['draw_number'],
-                'numbers': combination,
-                'bonus': row['bonus']
-            }
-            break
-            
-    return render_template('index.html', search_result=found, searched_numbers=numbers, last_draw=last_draw)
+    min_matches = request.form.get('min_matches', default=6, type=int)
+    if min_matches < 6:
+        include_bonus = request.form.get('include_bonus') == 'on'
+        try:
+            matches = find_partial_matches(history, numbers, max(min_matches, 1), include_bonus=include_bonus)
+        except ValueError as e:
+            return render_page(history, error=str(e))
+        return render_page(history, partial_matches=matches[:MAX_PARTIAL_RESULTS], partial_total=len(matches),
+                           min_matches=min_matches, include_bonus=include_bonus, searched_numbers=numbers)
+
+    found = find_combination(history, numbers)
+
+    return render_page(history, search_result=found, searched_numbers=numbers)
+
+def search_entry(history, text):
+    try:
+        entry = parse_entry(text)
+    except ValueError as e:
+        return render_page(history, error=str(e))
+    if entry.lines > MAX_ENTRY_LINES:
+        return render_page(history, error=f"That entry has {entry.lines:,} lines; the limit is {MAX_ENTRY_LINES:,}.")
+    return render_page(history, entry_result=evaluate_entry(history, entry))
+
+@app.route('/stats')
+def stats():
+    history = load_data()
+    window = request.args.get('window', default=DEFAULT_WINDOW, type=int)
+    if window < 1:
+        return jsonify(error="window must be at least 1."), 400
+    number_stats = get_stats(history, window)
+    number = request.args.get('number', type=int)
+    if number is not None:
+        try:
+            return jsonify(window=window, **number_stats.number(history, number))
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+    return jsonify(
+        window=window,
+        draws=len(history),
+        hot=number_stats.hot(),
+        cold=number_stats.cold(),
+        numbers=number_stats.table(history),
+    )
+
+@app.route('/cooccurrence')
+def cooccurrence():
+    history = load_data()
+    engine = get_cooccurrence(history)
+    try:
+        since = parse_date(request.args['since']) if request.args.get('since') else None
+        until = parse_date(request.args['until']) if request.args.get('until') else None
+        numbers_str = request.args.get('numbers')
+        if numbers_str:
+            numbers = sorted(int(n.strip()) for n in numbers_str.split(','))
+            if len(numbers) == 1:
+                partners = engine.partners(numbers[0], request.args.get('limit', default=6, type=int), since, until)
+                return jsonify(number=numbers[0], partners=[{'number': n, 'count': c} for n, c in partners])
+            return jsonify(numbers=numbers, count=engine.count(numbers, since, until))
+        size = request.args.get('size', default=2, type=int)
+        limit = min(request.args.get('limit', default=10, type=int), 100)
+        return jsonify(size=size, top=engine.top(size, limit, since, until))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+def simulation_version():
+    # A given ticket's result depends only on the query, which the ETag already
+    # covers; the default ticket is picked from the history
+    return 'simulate' if request.args.get('numbers') else data_version()
+
+@app.route('/simulate')
+@conditional(simulation_version, LIVE_CACHE_CONTROL)
+def simulate_odds():
+    draws = request.args.get('draws', default=DEFAULT_SIMULATED_DRAWS, type=int)
+    horizon = request.args.get('horizon', default=DEFAULT_HORIZON, type=int)
+    seed = request.args.get('seed', default=0, type=int)
+    if draws < 1 or draws > MAX_SIMULATED_DRAWS:
+        return jsonify(error=f"draws must be between 1 and {MAX_SIMULATED_DRAWS}."), 400
+    try:
+        numbers_str = request.args.get('numbers')
+        if numbers_str:
+            ticket, source = [int(n) for n in numbers_str.split(',')], 'given'
+        else:
+            rng = np.random.default_rng(seed)
+            ticket, source = generate_unique_combinations(load_data(), 1, rng=rng)[0].tolist(), 'never_drawn'
+        result = simulate(draws, horizon, ticket, seed)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(ticket_source=source, **result)
+
+@app.route('/api/v1/draws/latest')
+@conditional(data_version, LIVE_CACHE_CONTROL)
+def api_latest_draw():
+    last_draw = get_latest_draw(load_data())
+    if last_draw is None:
+        return jsonify(error="No draws available."), 404
+    return jsonify(last_draw)
+
+def draw_row_version():
+    # Built from the draw's own row, so a new draw leaves past draws' ETags alone
+    history = load_data()
+    row = find_draw_row(history, request.view_args['year'], request.view_args['number'])
+    if row is None:
+        return data_version()
+    draw = history.draw(row)
+    return f"{draw['date']}|{draw['draw_number']}|{draw['numbers']}|{draw['bonus']}"
+
+@app.route('/api/v1/draws/<int:year>/<int:number>')
+@conditional(draw_row_version, IMMUTABLE_CACHE_CONTROL)
+def api_draw(year, number):
+    history = load_data()
+    row = find_draw_row(history, year, number)
+    if row is None:
+        return jsonify(error=f"Draw {year % 100:02d}/{number} not found."), 404
+    return jsonify(history.draw(row))
+
+@app.route('/api/v1/draws')
+@conditional(data_version, LIVE_CACHE_CONTROL)
+def api_draws():
+    history = load_data()
+    page = request.args.get('page', default=1, type=int)
+    per_page = request.args.get('per_page', default=50, type=int)
+    if page < 1 or per_page < 1 or per_page > MAX_PAGE_SIZE:
+        return jsonify(error=f"page must be >= 1 and per_page between 1 and {MAX_PAGE_SIZE}."), 400
+    start = (page - 1) * per_page
+    end = min(start + per_page, len(history))
+    return jsonify(
+        page=page,
+        per_page=per_page,
+        total=len(history),
+        pages=-(-len(history) // per_page),
+        draws=[history.draw(i) for i in range(start, end)],
+    )
+
+@app.route('/api/search', methods=['POST'])
+def api_search():
+    history = load_data()
+    payload = request.get_json(silent=True)
+    items = payload.get('combinations') if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        return jsonify(error='Send a JSON list of combinations or {"combinations": [...]}.'), 400
+    if len(items) > MAX_SEARCH_COMBINATIONS:
+        return jsonify(error=f"At most {MAX_SEARCH_COMBINATIONS} combinations per request."), 400
+
+    # Invalid entries get their own error instead of failing the batch
+    valid_index, valid, errors = validate_tickets(items)
+    rows = lookup_combinations(history, valid)
+    results = [{'numbers': item, 'error': errors[i]} if i in errors else None for i, item in enumerate(items)]
+    drawn = 0
+    for i, numbers, row in zip(valid_index.tolist(), valid.tolist(), rows.tolist()):
+        result = {'numbers': numbers, 'drawn': row >= 0}
+        if row >= 0:
+            drawn += 1
+            result['draw'] = history.draw(row)
+        results[i] = result
+    return jsonify(total=len(items), valid=len(valid), drawn=drawn, results=results)
+
+@app.route('/api/check', methods=['POST'])
+def check():
+    history = load_data()
+    options = request.args
+    try:
+        upload = request.files.get('file')
+        if upload is not None:
+            fmt = 'json' if upload.filename.lower().endswith('.json') else 'csv'
+            tickets = parse_tickets(upload.read().decode('utf-8-sig'), fmt)
+        elif request.is_json:
+            payload = request.get_json()
+            if isinstance(payload, dict):
+                options = payload
+            tickets = parse_tickets(request.get_data(as_text=True), 'json')
+        else:
+            tickets = parse_tickets(request.form.get('numbers', ''), 'csv')
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify(error=str(e)), 400
+    if len(tickets) == 0:
+        return jsonify(error="No tickets given."), 400
+    if len(tickets) > MAX_CHECK_TICKETS:
+        return jsonify(error=f"At most {MAX_CHECK_TICKETS} tickets per request."), 400
+
+    include_draws = options.get('include_draws', len(tickets) <= 10)
+    if isinstance(include_draws, str):
+        include_draws = include_draws.lower() in ('1', 'true', 'yes')
+    try:
+        max_division = int(options.get('max_division', 7))
+    except (TypeError, ValueError):
+        return jsonify(error="max_division must be a number."), 400
+    return jsonify(check_tickets(history, tickets, include_draws=bool(include_draws), max_division=max_division))
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,253 @@
+"""Backfill past draws from the HKJC GraphQL endpoint by date range.
+
+The range is cut into fixed windows fetched with bounded concurrency. Each
+finished window is appended to a JSON-lines checkpoint, so an interrupted
+run picks up where it stopped:
+
+    python backfill.py --start 1993-01-01 --concurrency 4
+    python backfill.py --start 2024-01-01 --url http://127.0.0.1:8765/ --record fixtures.json
+
+Once every window is in, draws missing from the store (`--db`, compared by
+year and draw number) are merged into it with an atomic rewrite, pool and
+dividend figures are written to DIVIDENDS_FILE and the checkpoint is removed.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from draw_store import atomic_write
+from hkjc_client import HKJC_GRAPHQL_URL, HKJCClient, HKJCError
+from update_results import DB_FILE, draw_key, format_draw_number, update_database_incremental
+
+CHECKPOINT_FILE = "backfill_progress.jsonl"
+DIVIDENDS_FILE = "dividends.csv"
+DEFAULT_WINDOW_DAYS = 90  # the results query answers up to about three months
+DEFAULT_CONCURRENCY = 4
+DIVISIONS = 7
+DIVIDEND_COLUMNS = (
+    ["date", "draw_number", "total_investment", "jackpot", "unit_bet", "snowball"]
+    + [f"div{d}_{field}" for d in range(1, DIVISIONS + 1) for field in ("units", "dividend")]
+)
+
+Window = Tuple[date, date]
+
+
+def date_windows(start: date, end: date, days: int = DEFAULT_WINDOW_DAYS) -> Iterator[Window]:
+    """Consecutive inclusive (first, last) windows covering start..end."""
+    while start <= end:
+        last = min(start + timedelta(days=days - 1), end)
+        yield start, last
+        start = last + timedelta(days=1)
+
+
+def window_id(window: Window) -> str:
+    return f"{window[0].isoformat()}/{window[1].isoformat()}"
+
+
+class Checkpoint:
+    """Append-only record of finished windows and the draws they returned.
+
+    One JSON object per line, flushed and fsynced as each window finishes.
+    A line cut short by a crash is ignored on reload, and that window is
+    simply fetched again.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_FILE) -> None:
+        self.path = path
+        self.windows: Dict[str, List[Dict]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.windows[entry["window"]] = entry["draws"]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+
+    def done(self, window: Window) -> bool:
+        return window_id(window) in self.windows
+
+    def add(self, window: Window, draws: List[Dict]) -> None:
+        self.windows[window_id(window)] = draws
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"window": window_id(window), "draws": draws}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def draws(self) -> List[Dict]:
+        """Every recorded draw, once per year and draw number."""
+        seen: Set[Tuple[int, int]] = set()
+        draws = []
+        for window_draws in self.windows.values():
+            for d in window_draws:
+                try:
+                    key = draw_key(format_draw_number(d.get("year"), d.get("no")))
+                except (TypeError, ValueError):
+                    continue
+                if key not in seen:
+                    seen.add(key)
+                    draws.append(d)
+        return draws
+
+    def remove(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+async def fetch_windows(
+    client: HKJCClient, windows: List[Window], checkpoint: Checkpoint, concurrency: int
+) -> List[Window]:
+    """Fetch windows not yet checkpointed, at most `concurrency` at once; returns those that failed."""
+    semaphore = asyncio.Semaphore(concurrency)
+    failed: List[Window] = []
+
+    async def fetch(window: Window) -> None:
+        async with semaphore:
+            try:
+                draws = await client.fetch_results(*window)
+            except HKJCError as e:
+                print(f"{window_id(window)}: failed ({e})")
+                failed.append(window)
+                return
+        checkpoint.add(window, draws)
+        print(f"{window_id(window)}: {len(draws)} draw(s)")
+
+    await asyncio.gather(*(fetch(w) for w in windows if not checkpoint.done(w)))
+    return sorted(failed)
+
+
+def _int(value) -> Optional[int]:
+    """Whole-dollar amount from an HKJC figure such as '8,000,000' or 12.5."""
+    if value in (None, ""):
+        return None
+    try:
+        return int(float(str(value).replace(",", "").replace("$", "")))
+    except ValueError:
+        return None
+
+
+def dividend_row(draw: Dict) -> Optional[Dict]:
+    pool = draw.get("lotteryPool") or {}
+    prizes = {str(p.get("type")): p for p in pool.get("lotteryPrizes") or []}
+    if not prizes:
+        return None
+    draw_date = (draw.get("drawDate") or "")[:10]
+    row = {
+        "date": draw_date,
+        "draw_number": format_draw_number(draw.get("year"), draw.get("no")),
+        "total_investment": _int(pool.get("totalInvestment")),
+        "jackpot": _int(pool.get("jackpot")),
+        "unit_bet": _int(pool.get("unitBet")),
+        "snowball": draw.get("snowballCode") or "",
+    }
+    for d in range(1, DIVISIONS + 1):
+        prize = prizes.get(str(d)) or {}
+        row[f"div{d}_units"] = prize.get("winningUnit")
+        row[f"div{d}_dividend"] = _int(prize.get("dividend"))
+    return row
+
+
+def record_dividends(draws: List[Dict], path: str = DIVIDENDS_FILE) -> int:
+    """Merge pool and dividend figures into `path`, newest first; returns rows added."""
+    rows: Dict[Tuple[int, int], Dict] = {}
+    if os.path.exists(path):
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                rows[draw_key(row["draw_number"])] = row
+    before = len(rows)
+    for d in draws:
+        if (d.get("status") or "").lower() != "result":
+            continue
+        row = dividend_row(d)
+        if row is not None:
+            rows.setdefault(draw_key(row["draw_number"]), row)
+    if len(rows) == before:
+        return 0
+    with atomic_write(path, newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=DIVIDEND_COLUMNS)
+        writer.writeheader()
+        writer.writerows(sorted(rows.values(), key=lambda r: (r["date"], draw_key(r["draw_number"])), reverse=True))
+    return len(rows) - before
+
+
+async def backfill(
+    start: date,
+    end: date,
+    url: str = HKJC_GRAPHQL_URL,
+    window_days: int = DEFAULT_WINDOW_DAYS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    checkpoint_path: str = CHECKPOINT_FILE,
+    dividends_path: str = DIVIDENDS_FILE,
+    record: Optional[str] = None,
+    db_path: str = DB_FILE,
+) -> bool:
+    """Fetch start..end, then merge into the store; False if any window failed."""
+    windows = list(date_windows(start, end, window_days))
+    checkpoint = Checkpoint(checkpoint_path)
+    resumed = sum(checkpoint.done(w) for w in windows)
+    if resumed:
+        print(f"Resuming: {resumed} of {len(windows)} window(s) already fetched.")
+
+    client = HKJCClient(url, max_connections=concurrency)
+    started = time.perf_counter()
+    try:
+        failed = await fetch_windows(client, windows, checkpoint, concurrency)
+    finally:
+        await client.aclose()
+    elapsed = time.perf_counter() - started
+    fetched = len(windows) - resumed - len(failed)
+    print(f"Fetched {fetched} window(s) in {elapsed:.1f}s.")
+    if failed:
+        print(f"{len(failed)} window(s) failed; run again to retry them.")
+        return False
+
+    draws = checkpoint.draws()
+    if record:
+        with open(record, "w") as f:
+            json.dump({"lotteryDraws": draws}, f)
+        print(f"Recorded {len(draws)} draw(s) to {record}")
+    # Backfilled draws are older than the newest stored one, so this is a full,
+    # atomically written rebuild of db_path
+    update_database_incremental(draws, db_path)
+    print(f"Dividends: {record_dividends(draws, dividends_path)} new row(s) in {dividends_path}")
+    checkpoint.remove()
+    return True
+
+
+def parse_day(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill the results CSV from HKJC by date range.")
+    parser.add_argument("--start", type=parse_day, required=True, help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", type=parse_day, default=date.today(), help="last day (default: today)")
+    parser.add_argument("--url", default=HKJC_GRAPHQL_URL, help="GraphQL endpoint, e.g. a local stub")
+    parser.add_argument("--window-days", type=int, default=DEFAULT_WINDOW_DAYS)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--db", default=DB_FILE, help="results CSV to merge into")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    parser.add_argument("--dividends", default=DIVIDENDS_FILE)
+    parser.add_argument("--record", help="also save the fetched draws as a stub fixture")
+    args = parser.parse_args()
+    if args.start > args.end or args.window_days < 1 or args.concurrency < 1:
+        parser.error("need --start <= --end and positive --window-days and --concurrency")
+
+    ok = asyncio.run(
+        backfill(
+            args.start, args.end, args.url, args.window_days, args.concurrency,
+            args.checkpoint, args.dividends, args.record, args.db,
+        )
+    )
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""Replay the draw history against ticket strategies.
+
+Every strategy plays its tickets on each draw using only the draws before
+it; the engine scores all tickets at once and totals cost, prizes per
+division and ROI. Strategy x seed runs are spread over a process pool. The
+history is loaded and prepared once in the parent; forked workers inherit
+those arrays copy-on-write, and where fork is unavailable each worker gets
+one pickled copy when it starts:
+
+    python backtest.py --strategy never_drawn --strategy hot:window=50 --seeds 100
+    python backtest.py --strategy "fixed:numbers=1,2,3,4,5,6|7,8,9,10,11,12" --seeds 1
+"""
+
+import argparse
+import json
+import os
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from combo_index import TOTAL_COMBINATIONS, combination_ranks, unrank_combinations
+from draw_store import DEFAULT_CSV_PATH, DrawHistory, load_history
+from partial_search import MAX_NUMBER, get_masks
+from prize_checker import DIVISION_PRIZES, DIVISIONS, UNIT_BET, divisions_for, ticket_masks, validate_ticket
+
+MAX_TICKETS_PER_DRAW = 8
+
+
+class ReplayDraws:
+    """The history oldest first, with what strategies need to look back."""
+
+    def __init__(self, history: DrawHistory) -> None:
+        self.numbers = np.asarray(history.numbers)[::-1]
+        self.bonus = np.asarray(history.bonus)[::-1]
+        self.dates = np.asarray(history.dates)[::-1]
+        masks = get_masks(history)
+        self.number_masks = masks.numbers[::-1]
+        self.bonus_masks = masks.bonus[::-1]
+        # First position each combination was drawn at, for never-drawn picks
+        ranks = combination_ranks(self.numbers)
+        self.drawn_ranks, self.first_drawn = np.unique(ranks, return_index=True)
+        # Row i counts each number over the first i draws; built up front so
+        # forked workers share it instead of each building its own
+        presence = np.zeros((len(self.numbers) + 1, MAX_NUMBER + 1), dtype=np.int32)
+        presence[np.arange(1, len(self.numbers) + 1)[:, None], self.numbers] = 1
+        self.presence_sums = presence.cumsum(axis=0, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def first_drawn_at(self, ranks: np.ndarray) -> np.ndarray:
+        """Position each rank was first drawn at, or len(self) if never."""
+        at = np.searchsorted(self.drawn_ranks, ranks)
+        at = np.minimum(at, len(self.drawn_ranks) - 1)
+        found = self.drawn_ranks[at] == ranks
+        return np.where(found, self.first_drawn[at], len(self))
+
+    def window_counts(self, window: int) -> np.ndarray:
+        """(n, 50) times each number was drawn in the `window` draws before each draw."""
+        sums = self.presence_sums
+        end = np.arange(len(self))
+        return sums[end] - sums[np.maximum(end - window, 0)]
+
+
+def get_replay(history: DrawHistory) -> ReplayDraws:
+    return history.derived("replay_draws", ReplayDraws)
+
+
+def _random_tickets(rng: np.random.Generator, count: int) -> np.ndarray:
+    keys = rng.random((count, MAX_NUMBER))
+    return np.sort(np.argpartition(keys, 5, axis=1)[:, :6] + 1, axis=1).astype(np.uint8)
+
+
+class Strategy:
+    """A way of picking tickets.
+
+    `tickets(draws, rng)` returns (n, count, 6) numbers: the tickets played
+    on each of the n draws, oldest first. Row p may only depend on draws
+    before p.
+    """
+
+    name = ""
+
+    def __init__(self, count: int = 1) -> None:
+        if count < 1 or count > MAX_TICKETS_PER_DRAW:
+            raise ValueError(f"count must be between 1 and {MAX_TICKETS_PER_DRAW}.")
+        self.count = count
+
+    def tickets(self, draws: ReplayDraws, rng: np.random.Generator) -> np.ndarray:
+        raise NotImplementedError
+
+    def label(self) -> str:
+        return self.name if self.count == 1 else f"{self.name}x{self.count}"
+
+
+class RandomTickets(Strategy):
+    """Quick picks: uniformly random tickets."""
+
+    name = "random"
+
+    def tickets(self, draws: ReplayDraws, rng: np.random.Generator) -> np.ndarray:
+        return _random_tickets(rng, len(draws) * self.count).reshape(len(draws), self.count, 6)
+
+
+class NeverDrawn(Strategy):
+    """Uniformly random combinations that had not been drawn before each draw."""
+
+    name = "never_drawn"
+
+    def tickets(self, draws: ReplayDraws, rng: np.random.Generator) -> np.ndarray:
+        ranks = rng.integers(0, TOTAL_COMBINATIONS, size=len(draws) * self.count)
+        play_at = np.repeat(np.arange(len(draws)), self.count)
+        while True:
+            stale = draws.first_drawn_at(ranks) < play_at
+            if not stale.any():
+                break
+            ranks[stale] = rng.integers(0, TOTAL_COMBINATIONS, size=int(stale.sum()))
+        return unrank_combinations(ranks).reshape(len(draws), self.count, 6)
+
+
+class HotNumbers(Strategy):
+    """The most drawn numbers over the last `window` draws; ties broken at random.
+
+    Ticket k takes the (6k+1)-th to (6k+6)-th hottest numbers.
+    """
+
+    name = "hot"
+    sign = -1
+
+    def __init__(self, count: int = 1, window: int = 100) -> None:
+        super().__init__(count)
+        if window < 1:
+            raise ValueError("window must be at least 1.")
+        self.window = window
+
+    def tickets(self, draws: ReplayDraws, rng: np.random.Generator) -> np.ndarray:
+        counts = draws.window_counts(self.window)[:, 1:]
+        # The random fraction only reorders numbers with equal counts
+        order = np.argsort(self.sign * counts + rng.random(counts.shape) * 0.5, axis=1)
+        picks = order[:, :6 * self.count].reshape(len(draws), self.count, 6) + 1
+        return np.sort(picks, axis=2).astype(np.uint8)
+
+    def label(self) -> str:
+        return f"{super().label()}(window={self.window})"
+
+
+class ColdNumbers(HotNumbers):
+    """The least drawn numbers over the last `window` draws."""
+
+    name = "cold"
+    sign = 1
+
+
+class FixedTickets(Strategy):
+    """The same tickets on every draw."""
+
+    name = "fixed"
+
+    def __init__(self, numbers: Sequence[Sequence[int]]) -> None:
+        super().__init__(len(numbers))
+        self.fixed = np.array([validate_ticket(t) for t in numbers], dtype=np.uint8)
+
+    def tickets(self, draws: ReplayDraws, rng: np.random.Generator) -> np.ndarray:
+        return np.broadcast_to(self.fixed, (len(draws), self.count, 6))
+
+    def label(self) -> str:
+        return "fixed(" + " | ".join(",".join(str(n) for n in t) for t in self.fixed) + ")"
+
+
+STRATEGIES = {cls.name: cls for cls in (RandomTickets, NeverDrawn, HotNumbers, ColdNumbers, FixedTickets)}
+
+
+def parse_strategy(spec: str) -> Tuple[str, Dict[str, Any]]:
+    """'name' or 'name:key=value;key=value' -> (name, params).
+
+    Fixed tickets are given as numbers=1,2,3,4,5,6|7,8,9,10,11,12.
+    """
+    name, _, rest = spec.partition(":")
+    name = name.strip()
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown strategy '{name}'; choose from {', '.join(STRATEGIES)}.")
+    params: Dict[str, Any] = {}
+    for item in filter(None, (p.strip() for p in rest.split(";"))):
+        key, _, value = item.partition("=")
+        if key == "numbers":
+            params[key] = [[int(n) for n in t.split(",")] for t in value.split("|")]
+        else:
+            params[key] = int(value)
+    make_strategy(name, params)  # fail early on bad parameters
+    return name, params
+
+
+def make_strategy(name: str, params: Dict[str, Any]) -> Strategy:
+    try:
+        return STRATEGIES[name](**params)
+    except TypeError as e:
+        raise ValueError(f"Bad parameters for '{name}': {e}") from None
+
+
+def backtest(
+    draws: ReplayDraws,
+    strategy: Strategy,
+    seed: int = 0,
+    warmup: int = 0,
+    prizes: np.ndarray = DIVISION_PRIZES,
+    unit_bet: int = UNIT_BET,
+) -> Dict:
+    """Play `strategy` on every draw after the first `warmup` and total the outcome."""
+    rng = np.random.default_rng(seed)
+    tickets = strategy.tickets(draws, rng)[warmup:]
+    divisions = divisions_for(
+        ticket_masks(tickets),
+        draws.number_masks[warmup:, None],
+        draws.bonus_masks[warmup:, None],
+    )
+    counts = np.bincount(divisions.ravel(), minlength=DIVISIONS + 1)
+    played = int(tickets.shape[0] * tickets.shape[1])
+    cost = played * unit_bet
+    won = int(counts @ prizes)
+    return {
+        "strategy": strategy.label(),
+        "seed": seed,
+        "draws": int(tickets.shape[0]),
+        "tickets": played,
+        "cost": cost,
+        "prizes": won,
+        "roi": (won - cost) / cost if cost else 0.0,
+        "divisions": {str(d): int(counts[d]) for d in range(1, DIVISIONS + 1)},
+        "best_division": int(divisions[divisions > 0].min()) if (divisions > 0).any() else None,
+    }
+
+
+_worker_draws: Optional[ReplayDraws] = None
+
+
+def _init_worker(draws: ReplayDraws) -> None:
+    global _worker_draws
+    _worker_draws = draws
+
+
+def _run_job(job: Tuple[str, Dict[str, Any], int, int]) -> Dict:
+    name, params, seed, warmup = job
+    return backtest(_worker_draws, make_strategy(name, params), seed=seed, warmup=warmup)
+
+
+def run_backtests(
+    strategies: List[Tuple[str, Dict[str, Any]]],
+    seeds: Sequence[int],
+    csv_path: str = DEFAULT_CSV_PATH,
+    warmup: int = 0,
+    workers: Optional[int] = None,
+) -> List[Dict]:
+    """Every strategy with every seed, in parallel; results in job order."""
+    jobs = [(name, params, seed, warmup) for name, params in strategies for seed in seeds]
+    workers = workers or os.cpu_count() or 1
+    # Loaded once here; workers never read (or rewrite) the store themselves
+    _init_worker(get_replay(load_history(csv_path)))
+    if workers == 1:
+        return [_run_job(job) for job in jobs]
+    if "fork" in multiprocessing.get_all_start_methods():
+        # Workers inherit _worker_draws as set above
+        context, initializer, initargs = multiprocessing.get_context("fork"), None, ()
+    else:
+        context, initializer, initargs = None, _init_worker, (_worker_draws,)
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=initializer, initargs=initargs
+    ) as pool:
+        return list(pool.map(_run_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+
+def summarize(results: List[Dict]) -> List[Dict]:
+    """Per-strategy ROI spread and average division hits across seeds."""
+    by_strategy: Dict[str, List[Dict]] = {}
+    for result in results:
+        by_strategy.setdefault(result["strategy"], []).append(result)
+    summary = []
+    for label, runs in by_strategy.items():
+        roi = np.array([r["roi"] for r in runs])
+        summary.append(
+            {
+                "strategy": label,
+                "runs": len(runs),
+                "tickets_per_run": runs[0]["tickets"],
+                "roi_mean": float(roi.mean()),
+                "roi_median": float(np.median(roi)),
+                "roi_min": float(roi.min()),
+                "roi_max": float(roi.max()),
+                "divisions_mean": {
+                    d: float(np.mean([r["divisions"][d] for r in runs])) for d in runs[0]["divisions"]
+                },
+            }
+        )
+    return sorted(summary, key=lambda s: -s["roi_mean"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backtest ticket strategies over the draw history.")
+    parser.add_argument(
+        "--strategy", action="append", required=True,
+        help=f"name[:key=value;...], one of {', '.join(STRATEGIES)}; repeatable",
+    )
+    parser.add_argument("--seeds", type=int, default=10, help="runs per strategy, seeded 0..N-1")
+    parser.add_argument("--warmup", type=int, default=0, help="draws to observe before playing")
+    parser.add_argument("--workers", type=int, help="processes (default: all cores)")
+    parser.add_argument("--csv", default=DEFAULT_CSV_PATH)
+    parser.add_argument("--output", help="write every run and the summary as JSON")
+    args = parser.parse_args()
+
+    try:
+        strategies = [parse_strategy(s) for s in args.strategy]
+    except ValueError as e:
+        parser.error(str(e))
+    started = time.perf_counter()
+    results = run_backtests(strategies, range(args.seeds), args.csv, args.warmup, args.workers)
+    elapsed = time.perf_counter() - started
+    summary = summarize(results)
+
+    print(f"{len(results)} runs in {elapsed:.1f}s")
+    for s in summary:
+        print(
+            f"  {s['strategy']:<40} ROI mean {s['roi_mean']:+.1%}  "
+            f"median {s['roi_median']:+.1%}  range {s['roi_min']:+.1%} .. {s['roi_max']:+.1%}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"summary": summary, "runs": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""Benchmarks for the data layer, the Flask routes and the Telegram handlers.
+
+Each size gets a synthetic history written as a results CSV in a temporary
+directory; results are written as JSON so runs on different commits can be
+compared:
+
+    python benchmark.py                                # 4k, 50k and 1M draws
+    python benchmark.py --sizes 4000 50000 --output before.json
+    python benchmark.py --compare before.json          # ratios against a run
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import types
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import app as web
+import telegram_bot as bot
+import update_results
+from combo_index import ComboIndex, find_combination, generate_unique_combinations, lookup_combinations
+from draw_store import NUMBER_COLUMNS, DrawStore, columnar_path, export_columnar, load_columnar, parse_csv
+from partial_search import find_partial_matches
+from prize_checker import check_tickets
+from subscribers import SubscriberLog
+
+DEFAULT_SIZES = [4_000, 50_000, 1_000_000]
+RESULTS_DIR = "benchmark_results"
+FIRST_DRAW_DATE = date(1976, 1, 1)
+LAST_DRAW_DATE = date(2026, 1, 10)
+SEED = 20260110
+
+# Roughly constant wall time per benchmark: cheap calls repeat more often
+# on small histories, the slowest ones run once at 1M draws.
+_WORK_BUDGET = 200_000
+
+
+def _repeats(size: int, base: int) -> int:
+    return max(1, min(base, base * _WORK_BUDGET // max(size, 1)))
+
+
+def measure(
+    fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None
+) -> Dict[str, float]:
+    """Time `fn` `repeat` times; `setup` runs untimed before each call."""
+    if setup is not None:
+        setup()
+    fn()  # warm-up, also surfaces errors before timing
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "runs": repeat,
+        "min_ms": min(timings),
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.fmean(timings),
+    }
+
+
+def random_combinations(rng: np.random.Generator, count: int, picks: int = 6) -> np.ndarray:
+    """(count, picks) distinct numbers in 1-49, generated in chunks.
+
+    The first six columns are sorted; a seventh is left as the bonus.
+    """
+    out = np.empty((count, picks), dtype=np.uint8)
+    for start in range(0, count, 100_000):
+        chunk = min(100_000, count - start)
+        keys = rng.random((chunk, 49))
+        out[start:start + chunk] = np.argpartition(keys, picks - 1, axis=1)[:, :picks] + 1
+    out[:, :6].sort(axis=1)
+    return out
+
+
+def synthetic_draws(size: int, seed: int = SEED) -> pd.DataFrame:
+    """`size` random draws, newest first, spread over 1976-2026.
+
+    Large histories put several draws on one date; draw numbers count up
+    within each year like the real 'YY/NNN' ones.
+    """
+    rng = np.random.default_rng(seed)
+    drawn = random_combinations(rng, size, picks=7)
+    span = LAST_DRAW_DATE.toordinal() - FIRST_DRAW_DATE.toordinal()
+    # Oldest first while numbering, reversed at the end
+    ordinals = FIRST_DRAW_DATE.toordinal() + (np.arange(size, dtype=np.int64) * span) // max(size - 1, 1)
+    days = (ordinals - date(1970, 1, 1).toordinal()).astype("datetime64[D]")
+    years = days.astype("datetime64[Y]").astype(np.int64) + 1970
+    year_start = np.searchsorted(years, years, side="left")
+    sequence = np.arange(size) - year_start + 1
+    df = pd.DataFrame(
+        {
+            "date": np.datetime_as_string(days),
+            "draw_number": [f"{y % 100:02d}/{n:03d}" for y, n in zip(years.tolist(), sequence.tolist())],
+        }
+    )
+    for i, col in enumerate(NUMBER_COLUMNS):
+        df[col] = drawn[:, i]
+    df["bonus"] = drawn[:, 6]
+    return df.iloc[::-1].reset_index(drop=True)
+
+
+def hkjc_results(count: int, seed: int = SEED) -> List[Dict]:
+    """HKJC-shaped results for `count` draws after the synthetic history."""
+    rng = np.random.default_rng(seed + 1)
+    drawn = random_combinations(rng, count, picks=7)
+    results = []
+    for i in range(count):
+        day = LAST_DRAW_DATE + timedelta(days=2 * (i + 1))
+        results.append(
+            {
+                "status": "Result",
+                "year": str(day.year),
+                "no": 900 + i,
+                "drawDate": f"{day.isoformat()}T21:30:00+08:00",
+                "drawResult": {"drawnNo": drawn[i, :6].tolist(), "xDrawnNo": int(drawn[i, 6])},
+            }
+        )
+    return results
+
+
+class FakeMessage:
+    def __init__(self, replies: List[str]) -> None:
+        self.replies = replies
+
+    async def reply_text(self, text: str, **kwargs) -> "FakeMessage":
+        self.replies.append(text)
+        return FakeMessage(self.replies)
+
+    async def edit_text(self, text: str, **kwargs) -> "FakeMessage":
+        self.replies.append(text)
+        return self
+
+
+class FakeBot:
+    def __init__(self, replies: List[str]) -> None:
+        self.replies = replies
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> FakeMessage:
+        self.replies.append(text)
+        return FakeMessage(self.replies)
+
+
+def fake_update(args: List[str], bot_data: Optional[Dict] = None) -> tuple:
+    """A minimal Update/context pair for command handlers, plus the reply log."""
+    replies: List[str] = []
+    update = types.SimpleNamespace(
+        message=FakeMessage(replies),
+        effective_chat=types.SimpleNamespace(id=1),
+        callback_query=None,
+    )
+    application = types.SimpleNamespace(bot_data=bot_data if bot_data is not None else {})
+    context = types.SimpleNamespace(args=args, bot=FakeBot(replies), application=application, bot_data={})
+    return update, context, replies
+
+
+def run_handler(
+    loop: asyncio.AbstractEventLoop, handler: Callable, args: List[str], bot_data: Optional[Dict] = None
+) -> None:
+    update, context, replies = fake_update(args, bot_data)
+    loop.run_until_complete(handler(update, context))
+    # Handlers turn exceptions into apologies; a benchmark of those is useless
+    if any(r.startswith("Sorry") for r in replies):
+        raise RuntimeError(f"{handler.__name__} failed: {replies}")
+
+
+def bench_data_layer(path: str, size: int, results: Dict) -> None:
+    rng = np.random.default_rng(SEED + 2)
+    results["load.parse_csv"] = measure(lambda: parse_csv(path), _repeats(size, 3))
+    results["load.export_columnar"] = measure(lambda: export_columnar(path), _repeats(size, 3))
+    bin_path = columnar_path(path)
+    results["load.load_columnar"] = measure(lambda: load_columnar(bin_path), _repeats(size, 50))
+    results["load.store_cold"] = measure(lambda: DrawStore(path).load(), _repeats(size, 20))
+    store = DrawStore(path)
+    store.load()
+    results["load.store_warm"] = measure(store.load, 1000)
+
+    history = store.load()
+    results["index.build"] = measure(lambda: ComboIndex(history), _repeats(size, 5))
+    drawn = [int(n) for n in history.numbers[len(history) // 2]]
+    results["search.exact_hit"] = measure(lambda: find_combination(history, drawn), 1000)
+    undrawn = generate_unique_combinations(history, 1)[0].tolist()
+    results["search.exact_miss"] = measure(lambda: find_combination(history, undrawn), 1000)
+    batch = random_combinations(rng, 10_000)
+    results["search.batch_10k"] = measure(lambda: lookup_combinations(history, batch), 20)
+    results["search.partial_k3"] = measure(lambda: find_partial_matches(history, drawn, 3), _repeats(size, 50))
+    results["search.partial_k2_bonus"] = measure(
+        lambda: find_partial_matches(history, drawn, 2, include_bonus=True), _repeats(size, 20)
+    )
+    results["generate.batch_1000"] = measure(lambda: generate_unique_combinations(history, 1000), 20)
+    tickets = random_combinations(rng, 100)
+    results["check.tickets_100"] = measure(
+        lambda: check_tickets(history, tickets, include_draws=False), _repeats(size, 10)
+    )
+
+
+def bench_update(path: str, size: int, workdir: str, results: Dict) -> None:
+    db_file = os.path.join(workdir, "update.csv")
+    draws = hkjc_results(2)
+
+    def setup() -> None:
+        shutil.copyfile(path, db_file)
+        shutil.copyfile(columnar_path(path), columnar_path(db_file))
+
+    def run() -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            update_results.update_database_incremental(draws)
+
+    previous = update_results.DB_FILE
+    update_results.DB_FILE = db_file
+    try:
+        results["update.incremental_2_draws"] = measure(run, _repeats(size, 10), setup=setup)
+        # A running app then picks up the prepended rows and extends its indexes
+        store = DrawStore(db_file)
+
+        def update_then_reload() -> None:
+            setup()
+            store.load()
+            run()
+
+        results["update.store_extend"] = measure(store.load, _repeats(size, 10), setup=update_then_reload)
+    finally:
+        update_results.DB_FILE = previous
+
+
+def bench_flask(path: str, size: int, results: Dict) -> None:
+    rng = np.random.default_rng(SEED + 3)
+    web.CSV_PATH = path
+    history = web.load_data()
+    drawn = ",".join(str(n) for n in history.numbers[len(history) // 2])
+    combos = random_combinations(rng, 1000).tolist()
+    tickets = random_combinations(rng, 10).tolist()
+    client = web.app.test_client()
+    requests = {
+        "GET /": lambda: client.get("/"),
+        "GET /generate?count=10": lambda: client.get("/generate?count=10"),
+        "POST /search exact": lambda: client.post("/search", data={"numbers": drawn}),
+        "POST /search k=3": lambda: client.post("/search", data={"numbers": drawn, "min_matches": "3"}),
+        "GET /stats": lambda: client.get("/stats"),
+        "GET /api/v1/draws/latest": lambda: client.get("/api/v1/draws/latest"),
+        "GET /api/v1/draws?page=2": lambda: client.get("/api/v1/draws?page=2&per_page=100"),
+        "POST /api/search 1000": lambda: client.post("/api/search", json=combos),
+        "POST /api/check 10": lambda: client.post("/api/check", json={"tickets": tickets}),
+    }
+    for name, call in requests.items():
+        response = call()
+        if response.status_code != 200:
+            raise RuntimeError(f"{name} returned {response.status_code}")
+        results[f"flask.{name}"] = measure(call, _repeats(size, 100))
+
+
+def bench_bot(path: str, size: int, results: Dict) -> None:
+    bot.CSV_PATH = path
+    history = bot.load_data()
+    drawn = [str(n) for n in history.numbers[len(history) // 2]]
+    # Subscriptions from the fake chat go next to the synthetic history, never
+    # to the bot's real subscribers file
+    bot_data = {"subscribers": SubscriberLog(os.path.join(os.path.dirname(path), "subscribed_chats.jsonl"))}
+    handlers = {
+        "/generate": (bot.generate_command, []),
+        "/generate 50": (bot.generate_command, ["50"]),
+        "/search": (bot.search_command, drawn),
+        "/partial k=3": (bot.partial_command, drawn + ["k=3"]),
+        "/stats": (bot.stats_command, []),
+        "/together": (bot.together_command, drawn[:2]),
+        "/check": (bot.check_command, drawn),
+    }
+    loop = asyncio.new_event_loop()
+    try:
+        for name, (handler, args) in handlers.items():
+            results[f"bot.{name}"] = measure(lambda: run_handler(loop, handler, args, bot_data), _repeats(size, 100))
+    finally:
+        loop.close()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(sizes: List[int]) -> Dict:
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "sizes": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="mark6-bench-") as workdir:
+        for size in sizes:
+            print(f"{size} draws: writing synthetic history...")
+            path = os.path.join(workdir, f"draws_{size}.csv")
+            synthetic_draws(size).to_csv(path, index=False)
+            export_columnar(path)
+            results: Dict[str, Dict] = {}
+            for name, bench in (
+                ("data layer", bench_data_layer),
+                ("Flask routes", bench_flask),
+                ("bot handlers", bench_bot),
+            ):
+                print(f"{size} draws: {name}...")
+                bench(path, size, results)
+            print(f"{size} draws: incremental update...")
+            bench_update(path, size, workdir, results)
+            report["sizes"][str(size)] = results
+    return report
+
+
+def print_report(report: Dict, baseline: Optional[Dict] = None) -> None:
+    for size, results in report["sizes"].items():
+        print(f"\n{size} draws (median ms)")
+        base = (baseline or {}).get("sizes", {}).get(size, {})
+        for name, timing in results.items():
+            line = f"  {name:<34} {timing['median_ms']:>10.3f}"
+            if name in base and base[name]["median_ms"] > 0:
+                line += f"  x{timing['median_ms'] / base[name]['median_ms']:.2f} vs {baseline['commit']}"
+            print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the Mark Six data layer, web app and bot.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="history sizes in draws")
+    parser.add_argument("--output", help=f"JSON results file (default {RESULTS_DIR}/<commit>.json)")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    report = run(args.sizes)
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from telegram.error import BadRequest, ChatMigrated, Forbidden, RetryAfter, TelegramError
+
+# Telegram allows roughly 30 messages/s per bot and about 1 message/s per chat
+GLOBAL_RATE_PER_S = 25.0
+PER_CHAT_INTERVAL_S = 1.0
+MAX_CONCURRENCY = 50
+MAX_RETRIES = 3
+# First delay before retrying a generic TelegramError; doubles per attempt
+RETRY_BACKOFF_S = 0.5
+
+_GONE_CHAT_ERRORS = ("chat not found", "user is deactivated", "bot was kicked")
+
+
+class RateLimiter:
+    """Paces callers to `rate` acquisitions per second across all tasks.
+
+    `pause()` holds every caller until the given delay has passed, which is
+    how a RetryAfter from Telegram is applied to the whole broadcast.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._paused_until = 0.0
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+            # A RetryAfter may have paused everyone while we waited for our slot
+            if time.monotonic() >= self._paused_until:
+                return
+
+    def pause(self, delay: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+
+class BroadcastReport:
+    def __init__(self, name: str, chats: int) -> None:
+        self.name = name
+        self.chats = chats
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.blocked: Set[int] = set()
+        self.migrated: Dict[int, int] = {}
+        self.started = time.monotonic()
+        self.duration = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.duration if self.duration else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"Broadcast '{self.name}': {self.sent} messages to {self.chats} chats "
+            f"in {self.duration:.1f}s ({self.throughput:.1f} msg/s), "
+            f"{self.failed} failed, {len(self.blocked)} blocked, {self.retries} retries"
+        )
+
+
+class Broadcaster:
+    """Sends the same message sequence to many chats concurrently.
+
+    Chats are served by a bounded pool of workers. Every send passes a shared
+    global rate limiter, messages to one chat are spaced by
+    `per_chat_interval`, RetryAfter pauses all workers, and chats that blocked
+    the bot or no longer exist are reported in `BroadcastReport.blocked`.
+
+    Broadcasts run one at a time, and the per-chat spacing carries over from
+    one to the next, so two broadcasts started together still reach a chat
+    at most once per `per_chat_interval`.
+    """
+
+    def __init__(
+        self,
+        bot: Any,
+        rate: float = GLOBAL_RATE_PER_S,
+        per_chat_interval: float = PER_CHAT_INTERVAL_S,
+        concurrency: int = MAX_CONCURRENCY,
+        max_retries: int = MAX_RETRIES,
+        backoff: float = RETRY_BACKOFF_S,
+    ) -> None:
+        self.bot = bot
+        self.limiter = RateLimiter(rate)
+        self.per_chat_interval = per_chat_interval
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._serial = asyncio.Lock()
+        # Monotonic time of the last send per chat, across broadcasts
+        self._last_sent: Dict[int, float] = {}
+
+    async def _send(self, chat_id: int, message: Dict, report: BroadcastReport) -> Optional[int]:
+        """Send one message; returns the chat id to keep using, or None if gone."""
+        for attempt in range(self.max_retries + 1):
+            wait = self._last_sent.get(chat_id, 0.0) + self.per_chat_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.limiter.acquire()
+            self._last_sent[chat_id] = time.monotonic()
+            try:
+                await self.bot.send_message(chat_id=chat_id, **message)
+                report.sent += 1
+                return chat_id
+            except RetryAfter as e:
+                delay = e.retry_after
+                if hasattr(delay, "total_seconds"):
+                    delay = delay.total_seconds()
+                self.limiter.pause(float(delay))
+                report.retries += 1
+            except ChatMigrated as e:
+                report.migrated[chat_id] = e.new_chat_id
+                chat_id = e.new_chat_id
+                report.retries += 1
+            except Forbidden:
+                report.blocked.add(chat_id)
+                return None
+            except BadRequest as e:
+                if any(err in str(e).lower() for err in _GONE_CHAT_ERRORS):
+                    report.blocked.add(chat_id)
+                    return None
+                report.failed += 1
+                return chat_id
+            except TelegramError:
+                report.retries += 1
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self.backoff * (2 ** attempt))
+        report.failed += 1
+        return chat_id
+
+    async def _send_chat(self, chat_id: int, messages: List[Dict], report: BroadcastReport) -> None:
+        for message in messages:
+            next_chat_id = await self._send(chat_id, message, report)
+            if next_chat_id is None:
+                return
+            chat_id = next_chat_id
+
+    async def broadcast(
+        self, chat_ids: Iterable[int], messages: List[Dict], name: str = "broadcast"
+    ) -> BroadcastReport:
+        """Send `messages` (send_message kwargs without chat_id) to every chat.
+
+        Waits for any broadcast already running to finish first.
+        """
+        async with self._serial:
+            return await self._broadcast(list(chat_ids), messages, name)
+
+    async def _broadcast(self, chats: List[int], messages: List[Dict], name: str) -> BroadcastReport:
+        report = BroadcastReport(name, len(chats))
+        queue: asyncio.Queue = asyncio.Queue()
+        for chat_id in chats:
+            queue.put_nowait(chat_id)
+
+        async def worker() -> None:
+            while True:
+                try:
+                    chat_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await self._send_chat(chat_id, messages, report)
+                except Exception:
+                    report.failed += 1
+
+        workers = min(self.concurrency, len(chats))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        # Only recent sends can still hold up the next broadcast
+        cutoff = time.monotonic() - self.per_chat_interval
+        self._last_sent = {c: t for c, t in self._last_sent.items() if t > cutoff}
+        report.duration = time.monotonic() - report.started
+        return report
@@ -0,0 +1,167 @@
+from math import comb
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from draw_store import DrawHistory
+
+MAX_NUMBER = 49
+PICK = 6
+TOTAL_COMBINATIONS = comb(MAX_NUMBER, PICK)  # 13,983,816
+
+# _BINOM[k, n] == C(n, k) for the colex ranking below
+_BINOM = np.array(
+    [[comb(n, k) for n in range(MAX_NUMBER + 1)] for k in range(PICK + 1)],
+    dtype=np.int64,
+)
+
+
+def combination_rank(numbers: Iterable[int]) -> int:
+    """Colexicographic rank of a 6-of-49 combination, in [0, 13,983,815]."""
+    nums = sorted(int(n) for n in numbers)
+    if len(nums) != PICK or len(set(nums)) != PICK:
+        raise ValueError("A combination needs exactly 6 distinct numbers.")
+    if nums[0] < 1 or nums[-1] > MAX_NUMBER:
+        raise ValueError("Numbers must be between 1 and 49.")
+    return sum(comb(n - 1, i + 1) for i, n in enumerate(nums))
+
+
+def combination_ranks(numbers: np.ndarray) -> np.ndarray:
+    """Vectorized `combination_rank` over an (n, 6) array of valid combinations."""
+    nums = np.sort(np.asarray(numbers, dtype=np.int64), axis=1) - 1
+    ranks = np.zeros(len(nums), dtype=np.int64)
+    for i in range(PICK):
+        ranks += _BINOM[i + 1][nums[:, i]]
+    return ranks
+
+
+def unrank_subsets(ranks: np.ndarray, size: int = PICK) -> np.ndarray:
+    """Colex unranking of `size`-subsets: (n,) ranks -> ascending (n, size) 0-based items."""
+    rem = np.asarray(ranks, dtype=np.int64).copy()
+    out = np.empty((len(rem), size), dtype=np.int64)
+    for i in range(size, 0, -1):
+        # Largest c with C(c, i) <= rem; _BINOM[i] is non-decreasing in c
+        c = np.searchsorted(_BINOM[i], rem, side="right") - 1
+        out[:, i - 1] = c
+        rem -= _BINOM[i][c]
+    return out
+
+
+def unrank_combinations(ranks: np.ndarray) -> np.ndarray:
+    """Inverse of `combination_ranks`: (n,) ranks -> sorted (n, 6) uint8 numbers."""
+    return (unrank_subsets(ranks) + 1).astype(np.uint8)
+
+
+class ComboIndex:
+    """Bitset over all combination ranks plus a rank -> history row map.
+
+    Rows are stored counted from the oldest draw, so prepending newer draws
+    (`extend`) leaves existing entries valid.
+    """
+
+    def __init__(self, history: DrawHistory) -> None:
+        self.bits = np.zeros((TOTAL_COMBINATIONS + 7) // 8, dtype=np.uint8)
+        self.positions: Dict[int, int] = {}
+        self.size = 0
+        self._add(history.numbers)
+
+    def _add(self, numbers: np.ndarray) -> None:
+        """Index `numbers` (newest first), all newer than what is indexed."""
+        if len(numbers) == 0:
+            return
+        ranks = combination_ranks(numbers)
+        np.bitwise_or.at(self.bits, ranks >> 3, (1 << (ranks & 7)).astype(np.uint8))
+        # Iterate oldest first so a repeated combination maps to its latest draw
+        for row in range(len(ranks) - 1, -1, -1):
+            self.positions[int(ranks[row])] = self.size + len(ranks) - 1 - row
+        self.size += len(ranks)
+
+    def extend(self, history: DrawHistory, added: DrawHistory) -> "ComboIndex":
+        index = ComboIndex.__new__(ComboIndex)
+        index.bits = self.bits.copy()
+        index.positions = dict(self.positions)
+        index.size = self.size
+        index._add(added.numbers)
+        return index
+
+    def contains_rank(self, rank: int) -> bool:
+        return bool(self.bits[rank >> 3] & (1 << (rank & 7)))
+
+    def contains_ranks(self, ranks: np.ndarray) -> np.ndarray:
+        ranks = np.asarray(ranks, dtype=np.int64)
+        return ((self.bits[ranks >> 3] >> (ranks & 7).astype(np.uint8)) & 1).astype(bool)
+
+    def contains(self, numbers: Iterable[int]) -> bool:
+        return self.contains_rank(combination_rank(numbers))
+
+    def find_row(self, numbers: Iterable[int]) -> Optional[int]:
+        try:
+            rank = combination_rank(numbers)
+        except ValueError:
+            # Out-of-range or repeated numbers can never have been drawn
+            return None
+        position = self.positions.get(rank)
+        if position is None:
+            return None
+        return self.size - 1 - position
+
+    def rows_for_ranks(self, ranks: np.ndarray) -> np.ndarray:
+        """History row of the latest draw for each rank, or -1 if never drawn."""
+        ranks = np.asarray(ranks, dtype=np.int64)
+        rows = np.full(len(ranks), -1, dtype=np.int64)
+        # The bitset screens everything; only the rare hits touch the map
+        for i in np.flatnonzero(self.contains_ranks(ranks)):
+            rows[i] = self.size - 1 - self.positions[int(ranks[i])]
+        return rows
+
+
+def get_index(history: DrawHistory) -> ComboIndex:
+    return history.derived("combo_index", ComboIndex)
+
+
+def find_combination(history: DrawHistory, numbers: List[int]) -> Optional[Dict]:
+    row = get_index(history).find_row(numbers)
+    if row is None:
+        return None
+    result = history.draw(row)
+    result["numbers"] = tuple(sorted(result["numbers"]))
+    return result
+
+
+def lookup_combinations(history: DrawHistory, combinations: np.ndarray) -> np.ndarray:
+    """Row of the latest draw of each valid (m, 6) combination, -1 if never drawn."""
+    return get_index(history).rows_for_ranks(combination_ranks(combinations))
+
+
+def generate_unique_combinations(
+    history: DrawHistory,
+    count: int,
+    distinct: bool = True,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """Draw `count` never-drawn combinations as a sorted (count, 6) uint8 array.
+
+    Ranks are sampled uniformly, so every combination is as likely as with
+    `random.sample`. With `distinct`, no combination repeats within the batch.
+    """
+    if count < 0:
+        raise ValueError("count must not be negative.")
+    if count > TOTAL_COMBINATIONS - len(history):
+        raise ValueError("Not enough never-drawn combinations left.")
+    index = get_index(history)
+    rng = rng or np.random.default_rng()
+    picked = np.empty(0, dtype=np.int64)
+    while len(picked) < count:
+        # Almost every rank is undrawn, so a small oversample is usually one pass
+        need = count - len(picked)
+        ranks = rng.integers(0, TOTAL_COMBINATIONS, size=need + need // 8 + 8)
+        ranks = ranks[~index.contains_ranks(ranks)]
+        picked = np.concatenate([picked, ranks])
+        if distinct:
+            _, first = np.unique(picked, return_index=True)
+            picked = picked[np.sort(first)]
+    return unrank_combinations(picked[:count])
+
+
+def generate_unique_combination(history: DrawHistory) -> List[int]:
+    return [int(n) for n in generate_unique_combinations(history, 1)[0]]
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from combo_index import generate_unique_combinations
+from draw_store import DrawHistory
+from metrics import Counter, Gauge
+
+DEFAULT_POOL_SIZE = 2000
+# Seconds between the producer's own checks for a new draw
+DEFAULT_POLL_INTERVAL_S = 30.0
+
+POOL_TAKEN = Counter(
+    "mark6_combination_pool_taken_total",
+    "Combinations handed out, from the pool or generated inline when it ran short.",
+    ["pool", "source"],
+)
+POOL_FLUSHES = Counter(
+    "mark6_combination_pool_flushes_total", "Pools emptied because the history changed.", ["pool"]
+)
+POOL_SIZE = Gauge("mark6_combination_pool_size", "Combinations ready in the pool.", ["pool"])
+
+Combination = Tuple[int, ...]
+
+# Serializes start() across pools and threads; created once per interpreter,
+# so a forked child never swaps it while another thread holds it
+_START_LOCK = threading.Lock()
+
+
+def history_key(history: DrawHistory) -> Tuple[str, int]:
+    """Changes whenever draws are added, also for histories not read from a file."""
+    return history.source_hash, len(history)
+
+
+class CombinationPool:
+    """Bounded queue of never-drawn combinations, kept full by a background thread.
+
+    `take` pops ready combinations in O(1) each and generates inline only
+    when the pool runs short. Every combination is tied to the history it
+    was checked against; once the history changes (a new draw), the queue
+    is flushed and refilled, so nothing served can have been drawn.
+
+    `start` launches the producer thread. It is also called on every use,
+    which starts the thread in a forked worker process the first time the
+    worker needs it, since threads do not survive a fork. Call it lazily
+    (or from a post-fork hook) rather than at import in a pre-fork server.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], DrawHistory],
+        size: int = DEFAULT_POOL_SIZE,
+        low_water: Optional[int] = None,
+        poll_interval: float = DEFAULT_POLL_INTERVAL_S,
+        name: str = "default",
+    ) -> None:
+        self._load = load
+        self.size = size
+        self.low_water = size // 2 if low_water is None else low_water
+        self.poll_interval = poll_interval
+        self.name = name
+        self._queue: Deque[Combination] = deque()
+        self._key: Optional[Tuple[str, int]] = None
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+        self._wanted = threading.Condition(self._lock)
+        self.flushes = 0
+        self.hits = 0
+        self.misses = 0
+        POOL_SIZE.set_function(lambda: len(self._queue), pool=name)
+
+    def start(self) -> None:
+        """Start filling in the background; a no-op while the producer runs."""
+        if self._running():
+            return
+        with _START_LOCK:
+            if self._running():
+                return
+            if self._pid != os.getpid():
+                # Fresh lock after a fork: the parent's may have been held mid-refill
+                self._lock = threading.Lock()
+                self._wanted = threading.Condition(self._lock)
+                self._pid = os.getpid()
+            self._stopped = False
+            self._thread = threading.Thread(target=self._produce, name=f"combination-pool-{self.name}", daemon=True)
+            self._thread.start()
+
+    def _running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def _sync(self, history: DrawHistory) -> None:
+        """Flush when `history` is not the one queued entries were checked against; hold the lock."""
+        key = history_key(history)
+        if key != self._key:
+            if self._queue:
+                self.flushes += 1
+                POOL_FLUSHES.inc(pool=self.name)
+            self._queue.clear()
+            self._key = key
+
+    def _produce(self) -> None:
+        next_check = 0.0
+        while True:
+            with self._wanted:
+                self._wanted.wait_for(
+                    lambda: self._stopped or len(self._queue) < self.low_water or time.monotonic() >= next_check,
+                    timeout=max(0.0, next_check - time.monotonic()),
+                )
+                if self._stopped:
+                    return
+            try:
+                history = self._load()
+                next_check = time.monotonic() + self.poll_interval
+                with self._lock:
+                    self._sync(history)
+                    need = self.size - len(self._queue)
+                if need <= 0:
+                    continue
+                # Generated outside the lock so handlers keep taking meanwhile
+                fresh = generate_unique_combinations(history, need).tolist()
+                with self._lock:
+                    if self._key == history_key(history):
+                        self._queue.extend(tuple(c) for c in fresh[: self.size - len(self._queue)])
+            except Exception as e:
+                print(f"Combination pool {self.name}: refill failed: {e}")
+                next_check = time.monotonic() + self.poll_interval
+
+    def take(self, history: DrawHistory, count: int = 1) -> List[List[int]]:
+        """`count` distinct never-drawn combinations, sorted, for `history`."""
+        self.start()
+        with self._lock:
+            self._sync(history)
+            taken = [self._queue.popleft() for _ in range(min(count, len(self._queue)))]
+            if len(self._queue) < self.low_water:
+                self._wanted.notify()
+        # Separate refills can, very rarely, queue the same combination twice
+        taken = list(dict.fromkeys(taken))
+        self.hits += len(taken)
+        POOL_TAKEN.inc(len(taken), pool=self.name, source="pool")
+        short = count - len(taken)
+        if short:
+            self.misses += short
+            POOL_TAKEN.inc(short, pool=self.name, source="inline")
+            seen: Set[Combination] = set(taken)
+            while len(taken) < count:
+                for combo in generate_unique_combinations(history, count - len(taken)).tolist():
+                    if tuple(combo) not in seen:
+                        seen.add(tuple(combo))
+                        taken.append(tuple(combo))
+        return [list(c) for c in taken]
+
+    def refresh(self) -> None:
+        """Check for a new draw now rather than at the next poll."""
+        self.start()
+        history = self._load()
+        with self._wanted:
+            self._sync(history)
+            self._wanted.notify()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        with self._wanted:
+            self._stopped = True
+            self._wanted.notify()
+        self._thread.join()
+        self._thread = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "ready": len(self._queue),
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "flushes": self.flushes,
+        }
@@ -0,0 +1,184 @@
+from datetime import date
+from itertools import combinations
+from math import comb
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from draw_store import DrawHistory
+
+MAX_NUMBER = 49
+PAIR_COUNT = comb(MAX_NUMBER, 2)  # 1,176
+TRIPLE_COUNT = comb(MAX_NUMBER, 3)  # 18,424
+# Prefix sums are checkpointed every BLOCK draws; a query sums at most
+# 2 * BLOCK draws directly on top of two checkpoint lookups.
+BLOCK = 256
+
+_PAIR_COLUMNS = list(combinations(range(6), 2))
+_TRIPLE_COLUMNS = list(combinations(range(6), 3))
+
+
+def _pair_ranks(numbers: np.ndarray) -> np.ndarray:
+    """(n, 6) sorted numbers -> (n, 15) packed pair indices (colex rank)."""
+    x = numbers.astype(np.int32) - 1
+    cols = [x[:, j] * (x[:, j] - 1) // 2 + x[:, i] for i, j in _PAIR_COLUMNS]
+    return np.stack(cols, axis=1).astype(np.int16)
+
+
+def _triple_ranks(numbers: np.ndarray) -> np.ndarray:
+    """(n, 6) sorted numbers -> (n, 20) packed triple indices (colex rank)."""
+    x = numbers.astype(np.int32) - 1
+    cols = [
+        x[:, k] * (x[:, k] - 1) * (x[:, k] - 2) // 6 + x[:, j] * (x[:, j] - 1) // 2 + x[:, i]
+        for i, j, k in _TRIPLE_COLUMNS
+    ]
+    return np.stack(cols, axis=1).astype(np.int16)
+
+
+def _unrank(rank: int, size: int) -> Tuple[int, ...]:
+    out = []
+    for k in range(size, 0, -1):
+        c = k - 1
+        while comb(c + 1, k) <= rank:
+            c += 1
+        out.append(c + 1)
+        rank -= comb(c, k)
+    return tuple(sorted(out))
+
+
+def _rank(numbers: Sequence[int]) -> int:
+    nums = sorted(int(n) for n in numbers)
+    if len(set(nums)) != len(nums) or nums[0] < 1 or nums[-1] > MAX_NUMBER:
+        raise ValueError("Numbers must be distinct and between 1 and 49.")
+    return sum(comb(n - 1, i + 1) for i, n in enumerate(nums))
+
+
+class _Counts:
+    """Packed per-draw indices with checkpointed prefix sums (oldest first)."""
+
+    def __init__(self, ranks: np.ndarray, size: int) -> None:
+        self.ranks = ranks
+        self.size = size
+        blocks = len(ranks) // BLOCK
+        self.checkpoints = np.zeros((blocks + 1, size), dtype=np.int32)
+        for b in range(blocks):
+            block = ranks[b * BLOCK:(b + 1) * BLOCK].ravel()
+            self.checkpoints[b + 1] = self.checkpoints[b] + np.bincount(block, minlength=size)
+        self.tail = np.bincount(ranks[blocks * BLOCK:].ravel(), minlength=size).astype(np.int32)
+
+    def extend(self, new_ranks: np.ndarray) -> "_Counts":
+        counts = _Counts.__new__(_Counts)
+        counts.size = self.size
+        counts.ranks = np.concatenate([self.ranks, new_ranks])
+        counts.checkpoints = self.checkpoints
+        counts.tail = self.tail.copy()
+        for row in range(len(self.ranks), len(counts.ranks)):
+            np.add.at(counts.tail, counts.ranks[row].astype(np.intp), 1)
+            if (row + 1) % BLOCK == 0:
+                counts.checkpoints = np.vstack(
+                    [counts.checkpoints, counts.checkpoints[-1] + counts.tail]
+                )
+                counts.tail = np.zeros(counts.size, dtype=np.int32)
+        return counts
+
+    def _prefix(self, end: int) -> np.ndarray:
+        block = end // BLOCK
+        base = self.checkpoints[min(block, len(self.checkpoints) - 1)]
+        rest = self.ranks[block * BLOCK:end].ravel()
+        return base + np.bincount(rest, minlength=self.size)
+
+    def between(self, start: int, end: int) -> np.ndarray:
+        """Counts over draws [start, end), positions counted from the oldest."""
+        if start == 0 and end == len(self.ranks):
+            return self.checkpoints[-1] + self.tail
+        return self._prefix(end) - self._prefix(start)
+
+
+class CoOccurrence:
+    """Pair (49x49) and packed triple co-occurrence counts over the history.
+
+    Pairs and triples are stored by colex rank (1,176 and 18,424 slots).
+    Date windows resolve to a range of draws and are answered from prefix
+    sums checkpointed every BLOCK draws. `extend` appends new draws.
+    """
+
+    def __init__(self, history: DrawHistory) -> None:
+        numbers = np.sort(np.asarray(history.numbers)[::-1], axis=1)
+        self.dates = np.asarray(history.dates)[::-1].copy()
+        self.pairs = _Counts(_pair_ranks(numbers), PAIR_COUNT)
+        self.triples = _Counts(_triple_ranks(numbers), TRIPLE_COUNT)
+
+    def extend(self, history: DrawHistory, added: DrawHistory) -> "CoOccurrence":
+        numbers = np.sort(np.asarray(added.numbers)[::-1], axis=1)
+        engine = CoOccurrence.__new__(CoOccurrence)
+        engine.dates = np.concatenate([self.dates, np.asarray(added.dates)[::-1]])
+        engine.pairs = self.pairs.extend(_pair_ranks(numbers))
+        engine.triples = self.triples.extend(_triple_ranks(numbers))
+        return engine
+
+    def _range(self, since: Optional[date], until: Optional[date]) -> Tuple[int, int]:
+        start = 0 if since is None else int(np.searchsorted(self.dates, since.toordinal(), "left"))
+        end = len(self.dates) if until is None else int(
+            np.searchsorted(self.dates, until.toordinal(), "right")
+        )
+        return start, max(start, end)
+
+    def count(
+        self, numbers: Sequence[int], since: Optional[date] = None, until: Optional[date] = None
+    ) -> int:
+        """How often all of `numbers` (2 or 3 of them) were drawn together."""
+        if len(numbers) == 2:
+            counts = self.pairs
+        elif len(numbers) == 3:
+            counts = self.triples
+        else:
+            raise ValueError("Give 2 or 3 numbers.")
+        rank = _rank(numbers)
+        return int(counts.between(*self._range(since, until))[rank])
+
+    def pair_matrix(self, since: Optional[date] = None, until: Optional[date] = None) -> np.ndarray:
+        """Symmetric (50, 50) matrix indexed by number; row/column 0 unused."""
+        packed = self.pairs.between(*self._range(since, until))
+        matrix = np.zeros((MAX_NUMBER + 1, MAX_NUMBER + 1), dtype=np.int32)
+        rows, cols = np.tril_indices(MAX_NUMBER, -1)
+        # tril_indices enumerates (y, x) with x < y in colex order
+        matrix[cols + 1, rows + 1] = packed
+        matrix[rows + 1, cols + 1] = packed
+        return matrix
+
+    def partners(
+        self, number: int, k: int = 6, since: Optional[date] = None, until: Optional[date] = None
+    ) -> List[Tuple[int, int]]:
+        if number < 1 or number > MAX_NUMBER:
+            raise ValueError("Numbers must be between 1 and 49.")
+        row = self.pair_matrix(since, until)[number]
+        order = np.argsort(-row[1:], kind="stable")[:k] + 1
+        return [(int(n), int(row[n])) for n in order]
+
+    def top(
+        self, size: int = 2, k: int = 10, since: Optional[date] = None, until: Optional[date] = None
+    ) -> List[Dict]:
+        counts = {2: self.pairs, 3: self.triples}.get(size)
+        if counts is None:
+            raise ValueError("size must be 2 or 3.")
+        packed = counts.between(*self._range(since, until))
+        k = min(k, len(packed))
+        if k < 1:
+            return []
+        best = np.argpartition(-packed, k - 1)[:k]
+        best = best[np.lexsort((best, -packed[best]))]
+        return [{"numbers": list(_unrank(int(r), size)), "count": int(packed[r])} for r in best]
+
+
+def parse_date(value: str) -> date:
+    """Parse YYYY, YYYY-MM or YYYY-MM-DD as the first day it covers."""
+    parts = value.strip().split("-")
+    try:
+        fields = [int(p) for p in parts] + [1] * (3 - len(parts))
+        return date(*fields)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid date '{value}'; use YYYY, YYYY-MM or YYYY-MM-DD.")
+
+
+def get_cooccurrence(history: DrawHistory) -> CoOccurrence:
+    return history.derived("cooccurrence", CoOccurrence)
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import io
+import json
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from draw_store import atomic_write, export_columnar, parse_csv
+from partial_search import MAX_NUMBER
+
+
+class CSVMirror:
+    """Keeps a local copy of a remote CSV, revalidated with ETag/Last-Modified.
+
+    The validators and a content hash are kept next to the local file, so a
+    restart does not force a full download. The local file is only replaced
+    when the body actually changed and parses as a draw history, which is
+    what makes the DrawStore re-parse; a truncated or error-page body keeps
+    the old file. A new file also gets its columnar companion rebuilt here,
+    since the store only reads it. One pooled client is reused across syncs.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        path: str,
+        min_interval: float = 60.0,
+        timeout: float = 10.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.url = url
+        self.path = path
+        self.meta_path = f"{path}.meta.json"
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._last_check = 0.0
+        self._lock = asyncio.Lock()
+        self.not_modified = 0
+        self.unchanged = 0
+        self.updated = 0
+        self.errors = 0
+        self.rejected = 0
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _read_meta(self) -> Dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta: Dict) -> None:
+        with atomic_write(self.meta_path) as f:
+            json.dump(meta, f)
+
+    @staticmethod
+    def validate(content: bytes) -> None:
+        """Raise ValueError unless `content` is a results CSV the store can load."""
+        if not content.endswith(b"\n"):
+            # Every row ends in a newline, so a body cut short ends mid-row
+            raise ValueError("truncated")
+        try:
+            history = parse_csv(io.BytesIO(content))
+        except Exception as e:
+            raise ValueError(f"not a results CSV: {e}")
+        if not len(history):
+            raise ValueError("no draws")
+        for column in (history.numbers, history.bonus):
+            if column.min() < 1 or column.max() > MAX_NUMBER:
+                raise ValueError("numbers out of range")
+
+    def _write_csv(self, content: bytes) -> None:
+        with atomic_write(self.path, "wb") as f:
+            f.write(content)
+        try:
+            export_columnar(self.path)
+        except OSError as e:
+            # The store still loads; it parses the CSV until the next update
+            print(f"Could not rebuild the columnar copy of {self.path}: {e}")
+
+    async def sync(self, force: bool = False) -> bool:
+        """Revalidate the local copy; returns True if the file was replaced.
+
+        Calls within `min_interval` of the previous check are skipped unless
+        `force` is set.
+        """
+        async with self._lock:
+            if not force and time.monotonic() - self._last_check < self.min_interval:
+                return False
+            self._last_check = time.monotonic()
+
+            meta = self._read_meta()
+            headers = {}
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+            if self._client is None:
+                self._client = httpx.AsyncClient(timeout=self.timeout, transport=self._transport)
+            try:
+                res = await self._client.get(self.url, headers=headers)
+                if res.status_code == 304:
+                    self.not_modified += 1
+                    return False
+                res.raise_for_status()
+            except httpx.HTTPError:
+                self.errors += 1
+                return False
+
+            digest = hashlib.sha256(res.content).hexdigest()
+            new_meta = {
+                "etag": res.headers.get("ETag"),
+                "last_modified": res.headers.get("Last-Modified"),
+                "sha256": digest,
+            }
+            changed = digest != meta.get("sha256")
+            if changed:
+                try:
+                    await asyncio.to_thread(self.validate, res.content)
+                except ValueError as e:
+                    # Keep the old file and validators, so the next sync downloads again
+                    print(f"Ignoring download of {self.url}: {e}")
+                    self.rejected += 1
+                    return False
+                await asyncio.to_thread(self._write_csv, res.content)
+                self.updated += 1
+            else:
+                self.unchanged += 1
+            self._write_meta(new_meta)
+            return changed
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "not_modified": self.not_modified,
+            "unchanged": self.unchanged,
+            "updated": self.updated,
+            "errors": self.errors,
+            "rejected": self.rejected,
+        }
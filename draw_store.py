@@ -0,0 +1,394 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from typing import IO, Any, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from metrics import Gauge, Histogram
+
+DEFAULT_CSV_PATH = "merged_results.csv"
+NUMBER_COLUMNS = ["num_1", "num_2", "num_3", "num_4", "num_5", "num_6"]
+
+COLUMNAR_MAGIC = b"MK6COLS1"
+
+READ_SECONDS = Histogram(
+    "mark6_history_read_seconds", "Time to read the draw history from disk.", ["format"]
+)
+RELOAD_SECONDS = Histogram(
+    "mark6_draw_store_reload_seconds",
+    "Time for a store reload, including carrying derived indexes forward.",
+    ["mode"],
+)
+DRAWS_LOADED = Gauge("mark6_draws_loaded", "Draws in the current history snapshot.", ["path"])
+
+_ALIGN = 8
+
+
+class StringColumn:
+    """Read-only sequence of strings stored as one UTF-8 blob plus offsets."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray) -> None:
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class DrawHistory:
+    """Immutable snapshot of the draw history, newest draw first."""
+
+    def __init__(
+        self,
+        dates: np.ndarray,
+        draw_numbers: Sequence[str],
+        numbers: np.ndarray,
+        bonus: np.ndarray,
+        version: int,
+        source_hash: str = "",
+    ) -> None:
+        self.dates = dates  # int32 date ordinals
+        self.draw_numbers = draw_numbers
+        self.numbers = numbers  # uint8, shape (n, 6), as drawn
+        self.bonus = bonus  # uint8
+        self.version = version
+        self.source_hash = source_hash  # sha256 of the CSV this was built from
+        self._derived: Dict[str, Any] = {}
+        # Reentrant: a derived structure may be built from other derived ones
+        self._derived_lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def date_str(self, i: int) -> str:
+        return date.fromordinal(int(self.dates[i])).isoformat()
+
+    def draw(self, i: int) -> Dict:
+        return {
+            "date": self.date_str(i),
+            "draw_number": self.draw_numbers[i],
+            "numbers": [int(n) for n in self.numbers[i]],
+            "bonus": int(self.bonus[i]),
+        }
+
+    def latest(self) -> Optional[Dict]:
+        if self.empty:
+            return None
+        return self.draw(0)
+
+    def derived(self, key: str, build: Callable[["DrawHistory"], Any]) -> Any:
+        """Return a structure built from this snapshot, building it on first use.
+
+        Derived indexes live on the snapshot, so a full reload discards them.
+        A structure with an `extend(history, added)` method is carried over
+        incrementally by `with_new_draws` instead of being rebuilt.
+        """
+        value = self._derived.get(key)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = self._derived[key] = build(self)
+        return value
+
+    def with_new_draws(
+        self, added: "DrawHistory", version: int = 0, source_hash: str = ""
+    ) -> "DrawHistory":
+        """New snapshot with `added` (newest first) in front of this one."""
+        history = DrawHistory(
+            dates=np.concatenate([added.dates, self.dates]).astype(np.int32),
+            draw_numbers=list(added.draw_numbers) + list(self.draw_numbers),
+            numbers=np.concatenate([added.numbers, self.numbers]).astype(np.uint8),
+            bonus=np.concatenate([added.bonus, self.bonus]).astype(np.uint8),
+            version=version,
+            source_hash=source_hash,
+        )
+        with self._derived_lock:
+            derived = dict(self._derived)
+        for key, value in derived.items():
+            if hasattr(value, "extend"):
+                history._derived[key] = value.extend(history, added)
+        return history
+
+    def newest(self, count: int) -> "DrawHistory":
+        return DrawHistory(
+            dates=self.dates[:count],
+            draw_numbers=[self.draw_numbers[i] for i in range(min(count, len(self)))],
+            numbers=self.numbers[:count],
+            bonus=self.bonus[:count],
+            version=self.version,
+            source_hash=self.source_hash,
+        )
+
+    def extends(self, older: "DrawHistory") -> int:
+        """Number of draws prepended to `older` to give this history, or -1."""
+        added = len(self) - len(older)
+        if added < 0:
+            return -1
+        if older.empty:
+            return added
+        if not (
+            np.array_equal(self.dates[added:], older.dates)
+            and np.array_equal(self.numbers[added:], older.numbers)
+            and np.array_equal(self.bonus[added:], older.bonus)
+            and self.draw_numbers[added] == older.draw_numbers[0]
+        ):
+            return -1
+        return added
+
+
+def history_from_draws(draws: Sequence[Dict]) -> DrawHistory:
+    """Build a history from draw dicts as returned by `DrawHistory.draw`."""
+    return DrawHistory(
+        dates=np.array(
+            [date.fromisoformat(d["date"]).toordinal() for d in draws], dtype=np.int32
+        ),
+        draw_numbers=[str(d["draw_number"]) for d in draws],
+        numbers=np.array([d["numbers"] for d in draws], dtype=np.uint8).reshape(-1, 6),
+        bonus=np.array([d["bonus"] for d in draws], dtype=np.uint8),
+        version=0,
+    )
+
+
+def file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def parse_csv(path: str, version: int = 0, source_hash: str = "") -> DrawHistory:
+    df = pd.read_csv(path, usecols=["date", "draw_number"] + NUMBER_COLUMNS + ["bonus"])
+    df = df.dropna()
+    dates = pd.to_datetime(df["date"], errors="coerce")
+    df = df[dates.notna()]
+    dates = dates[dates.notna()]
+    ordinals = np.fromiter(
+        (d.toordinal() for d in dates.dt.date), dtype=np.int32, count=len(dates)
+    )
+    return DrawHistory(
+        dates=ordinals,
+        draw_numbers=[str(d) for d in df["draw_number"]],
+        numbers=df[NUMBER_COLUMNS].to_numpy(dtype=np.uint8),
+        bonus=df["bonus"].to_numpy(dtype=np.uint8),
+        version=version,
+        source_hash=source_hash,
+    )
+
+
+def columnar_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + ".bin"
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w", **kwargs: Any) -> Iterator[IO]:
+    """Write to a temp file of its own next to `path`, then replace `path` with it.
+
+    Every writer gets a unique temp name, so concurrent writers (web
+    workers, backtest workers, the updater) never write into each other's
+    file; the last replace wins and readers only ever see whole files.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        # mkstemp creates 0600 files; keep what the file it replaces had
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_columnar(history: DrawHistory, path: str) -> None:
+    """Write `history` as a memory-mappable columnar file.
+
+    Layout: magic, uint32 header length, JSON header, then each column as raw
+    little-endian data aligned to 8 bytes. Numbers are stored column by
+    column (shape (6, n)), draw numbers as a UTF-8 blob with int32 offsets.
+    """
+    encoded = [str(d).encode("utf-8") for d in history.draw_numbers]
+    offsets = np.zeros(len(encoded) + 1, dtype="<i4")
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    columns = {
+        "numbers": np.ascontiguousarray(np.asarray(history.numbers, dtype=np.uint8).T),
+        "bonus": np.asarray(history.bonus, dtype=np.uint8),
+        "dates": np.asarray(history.dates, dtype="<i4"),
+        "draw_number_offsets": offsets,
+        "draw_number_blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+    }
+
+    meta = {}
+    position = 0
+    for name, arr in columns.items():
+        meta[name] = {"offset": position, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+        position += -(-arr.nbytes // _ALIGN) * _ALIGN
+    header = json.dumps(
+        {"rows": len(history), "source_sha256": history.source_hash, "columns": meta}
+    ).encode("utf-8")
+    data_start = -(-(len(COLUMNAR_MAGIC) + 4 + len(header)) // _ALIGN) * _ALIGN
+
+    with atomic_write(path, "wb") as f:
+        f.write(COLUMNAR_MAGIC + struct.pack("<I", len(header)) + header)
+        for name, arr in columns.items():
+            f.seek(data_start + meta[name]["offset"])
+            f.write(arr.tobytes())
+        f.truncate(data_start + position)
+
+
+def read_columnar_header(path: str) -> Dict:
+    with open(path, "rb") as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a columnar draw file")
+        (length,) = struct.unpack("<I", f.read(4))
+        return json.loads(f.read(length))
+
+
+def load_columnar(path: str, version: int = 0) -> DrawHistory:
+    """Memory-map a file written by `write_columnar`; no parsing or copying."""
+    header = read_columnar_header(path)
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    length = struct.unpack_from("<I", mm, len(COLUMNAR_MAGIC))[0]
+    data_start = -(-(len(COLUMNAR_MAGIC) + 4 + length) // _ALIGN) * _ALIGN
+
+    def column(name: str) -> np.ndarray:
+        spec = header["columns"][name]
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        arr = np.frombuffer(mm, dtype=dtype, count=count, offset=data_start + spec["offset"])
+        return arr.reshape(spec["shape"])
+
+    return DrawHistory(
+        dates=column("dates"),
+        draw_numbers=StringColumn(column("draw_number_blob"), column("draw_number_offsets")),
+        numbers=column("numbers").T,
+        bonus=column("bonus"),
+        version=version,
+        source_hash=header.get("source_sha256", ""),
+    )
+
+
+def export_columnar(csv_path: str = DEFAULT_CSV_PATH) -> str:
+    """Write the columnar companion of `csv_path`; returns its path."""
+    history = parse_csv(csv_path, source_hash=file_sha256(csv_path))
+    path = columnar_path(csv_path)
+    write_columnar(history, path)
+    return path
+
+
+def load_history(csv_path: str, version: int = 0, rebuild: bool = False) -> DrawHistory:
+    """Load `csv_path`, memory-mapping its columnar companion when it is current.
+
+    The companion is used only if it was built from a CSV with the same
+    content hash; otherwise the CSV is parsed. Only `rebuild` (the update and
+    ingest scripts) rewrites a stale companion, so request handlers never
+    write to disk.
+    """
+    started = time.perf_counter()
+    source_hash = file_sha256(csv_path)
+    bin_path = columnar_path(csv_path)
+    try:
+        if read_columnar_header(bin_path).get("source_sha256") == source_hash:
+            history = load_columnar(bin_path, version=version)
+            READ_SECONDS.observe(time.perf_counter() - started, format="columnar")
+            return history
+    except (OSError, ValueError):
+        pass  # missing or unreadable companion: parse the CSV
+    history = parse_csv(csv_path, version=version, source_hash=source_hash)
+    READ_SECONDS.observe(time.perf_counter() - started, format="csv")
+    if rebuild:
+        write_columnar(history, bin_path)
+    return history
+
+
+class DrawStore:
+    """Loads the results CSV once and reloads it only when the file changes.
+
+    `load()` stats the file on each call and reloads only if its mtime or
+    size differ from the last load, or after `invalidate()`. Loading prefers
+    the memory-mapped columnar companion (see `load_history`).
+    """
+
+    def __init__(self, path: str = DEFAULT_CSV_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._history: Optional[DrawHistory] = None
+        self._version = 0
+
+    def _file_stamp(self) -> Tuple[int, int]:
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def load(self) -> DrawHistory:
+        stamp = self._file_stamp()
+        history = self._history
+        if history is not None and stamp == self._stamp:
+            return history
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            if self._history is not None and stamp == self._stamp:
+                return self._history
+            started = time.perf_counter()
+            version = self._version + 1
+            history = load_history(self.path, version=version)
+            previous = self._history
+            added = history.extends(previous) if previous is not None else -1
+            mode = "full"
+            if added == 0:
+                # Touched but not changed: keep the version so caches keyed on it stay valid
+                history, mode = previous, "unchanged"
+            elif added > 0:
+                mode = "extend"
+                # Only new draws were prepended: carry derived indexes forward
+                history = previous.with_new_draws(
+                    history.newest(added),
+                    version=version,
+                    source_hash=history.source_hash,
+                )
+            if added != 0:
+                self._version = version
+            self._history = history
+            self._stamp = stamp
+            RELOAD_SECONDS.observe(time.perf_counter() - started, mode=mode)
+            DRAWS_LOADED.set(len(history), path=self.path)
+            return self._history
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._stamp = None
+
+
+_stores: Dict[str, DrawStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path: str = DEFAULT_CSV_PATH) -> DrawStore:
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = DrawStore(path)
+        return store
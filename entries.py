@@ -0,0 +1,152 @@
+import re
+from math import comb
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from combo_index import PICK, combination_ranks, get_index, unrank_subsets
+from draw_store import DrawHistory
+from partial_search import MAX_NUMBER, get_masks
+from prize_checker import DIVISION_PRIZES, DIVISIONS, UNIT_BET, divisions_for, ticket_masks
+
+MAX_BANKERS = PICK - 1
+# Lines expanded per step: bounds memory however large the entry is
+LINE_CHUNK = 1 << 16
+MAX_DRAWN_LISTED = 20
+
+_BANKER_SEPARATOR = re.compile(r"[>|#]")
+_ENTRY_TEXT = re.compile(r"[\d\s,;>|#]+")
+
+
+class Entry:
+    """A single, multiple (7+ numbers) or banker entry.
+
+    Bankers are on every line; the legs fill the remaining places in every
+    possible way, so an entry covers C(legs, 6 - bankers) lines.
+    """
+
+    def __init__(self, legs: Iterable[int], bankers: Iterable[int] = ()) -> None:
+        self.bankers = sorted(int(n) for n in bankers)
+        self.legs = sorted(int(n) for n in legs)
+        numbers = self.bankers + self.legs
+        if len(set(numbers)) != len(numbers):
+            raise ValueError("Numbers must not repeat.")
+        if numbers and (min(numbers) < 1 or max(numbers) > MAX_NUMBER):
+            raise ValueError("Numbers must be between 1 and 49.")
+        if len(self.bankers) > MAX_BANKERS:
+            raise ValueError(f"A banker entry takes 1 to {MAX_BANKERS} bankers.")
+        if self.bankers and len(numbers) < PICK + 1:
+            raise ValueError("Bankers and legs must add up to at least 7 numbers.")
+        if len(numbers) < PICK:
+            raise ValueError("An entry needs at least 6 numbers.")
+
+    @property
+    def kind(self) -> str:
+        if self.bankers:
+            return "banker"
+        return "multiple" if len(self.legs) > PICK else "single"
+
+    @property
+    def lines(self) -> int:
+        return comb(len(self.legs), PICK - len(self.bankers))
+
+    def cost(self, unit_bet: int = UNIT_BET) -> int:
+        return self.lines * unit_bet
+
+    def describe(self) -> str:
+        legs = ", ".join(str(n) for n in self.legs)
+        if not self.bankers:
+            return legs
+        return ", ".join(str(n) for n in self.bankers) + " > " + legs
+
+    def iter_lines(self, chunk: int = LINE_CHUNK) -> Iterator[np.ndarray]:
+        """Sorted (m, 6) uint8 lines, at most `chunk` at a time.
+
+        Line i picks the legs at the positions given by the colex rank i
+        among subsets of the legs, so lines are produced straight from a
+        rank range without enumerating tuples.
+        """
+        legs = np.array(self.legs, dtype=np.uint8)
+        bankers = np.array(self.bankers, dtype=np.uint8)
+        size = PICK - len(bankers)
+        for start in range(0, self.lines, chunk):
+            ranks = np.arange(start, min(start + chunk, self.lines), dtype=np.int64)
+            picked = legs[unrank_subsets(ranks, size)]
+            if len(bankers):
+                picked = np.concatenate([np.broadcast_to(bankers, (len(ranks), len(bankers))), picked], axis=1)
+                picked.sort(axis=1)
+            yield picked
+
+
+def _tokens(text: str) -> List[str]:
+    return text.replace(",", " ").replace(";", " ").split()
+
+
+def parse_entry(text: str) -> Entry:
+    """'1 2 3 4 5 6 7' (multiple) or '1 2 > 3 4 5 6 7' (bankers before '>', '|' or '#')."""
+    parts = _BANKER_SEPARATOR.split(text)
+    if len(parts) > 2:
+        raise ValueError("Use one '>' between the bankers and the legs.")
+
+    def numbers(part: str) -> List[int]:
+        try:
+            return [int(p) for p in _tokens(part)]
+        except ValueError:
+            raise ValueError("Numbers must be integers 1-49.")
+
+    if len(parts) == 2:
+        return Entry(numbers(parts[1]), numbers(parts[0]))
+    return Entry(numbers(parts[0]))
+
+
+def is_entry_text(text: str) -> bool:
+    """Whether `text` reads as a multiple or banker entry rather than one line.
+
+    Only digits and separators count, so free text still gets the usage hint.
+    """
+    if not _ENTRY_TEXT.fullmatch(text.strip()):
+        return False
+    return bool(_BANKER_SEPARATOR.search(text)) or len(_tokens(text)) > PICK
+
+
+def evaluate_entry(
+    history: DrawHistory, entry: Entry, row: int = 0, max_listed: int = MAX_DRAWN_LISTED
+) -> Dict:
+    """Check every line of `entry` against the history and one draw (the latest by default).
+
+    Reports cost, lines won per division and their prize in that draw, and
+    how many lines had ever been drawn, listing the first `max_listed`.
+    """
+    index = get_index(history)
+    masks = get_masks(history)
+    draw: Optional[Dict] = history.draw(row) if len(history) else None
+    counts = np.zeros(DIVISIONS + 1, dtype=np.int64)
+    drawn_count = 0
+    drawn: List[Dict] = []
+    for lines in entry.iter_lines():
+        ranks = combination_ranks(lines)
+        hits = np.flatnonzero(index.contains_ranks(ranks))
+        drawn_count += len(hits)
+        if len(drawn) < max_listed and len(hits):
+            for i, hit_row in zip(hits, index.rows_for_ranks(ranks[hits])):
+                if len(drawn) >= max_listed:
+                    break
+                result = history.draw(int(hit_row))
+                result["line"] = [int(n) for n in lines[i]]
+                drawn.append(result)
+        if draw is not None:
+            divisions = divisions_for(ticket_masks(lines), masks.numbers[row], masks.bonus[row])
+            counts += np.bincount(divisions, minlength=DIVISIONS + 1)
+    return {
+        "entry": entry.describe(),
+        "kind": entry.kind,
+        "bankers": entry.bankers,
+        "legs": entry.legs,
+        "lines": entry.lines,
+        "cost": entry.cost(),
+        "draw": draw,
+        "divisions": {str(d): int(counts[d]) for d in range(1, DIVISIONS + 1)},
+        "prizes": int(counts @ DIVISION_PRIZES),
+        "previously_drawn": drawn_count,
+        "drawn_lines": drawn,
+    }
@@ -0,0 +1,242 @@
+import asyncio
+import random
+import time
+from datetime import date
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from metrics import Counter, Histogram
+
+HKJC_GRAPHQL_URL = "https://info.cld.hkjc.com/graphql/base/"
+
+DRAWS_FRAGMENT = (
+    "fragment lotteryDrawsFragment on LotteryDraw {\n"
+    "  id\n  year\n  no\n  openDate\n  closeDate\n  drawDate\n  status\n"
+    "  snowballCode\n  snowballName_en\n  snowballName_ch\n"
+    "  lotteryPool {\n"
+    "    sell\n    status\n    totalInvestment\n    jackpot\n    unitBet\n"
+    "    estimatedPrize\n    derivedFirstPrizeDiv\n"
+    "    lotteryPrizes { type winningUnit dividend }\n"
+    "  }\n"
+    "  drawResult { drawnNo xDrawnNo }\n"
+    "}\n"
+)
+
+MARKSIX_QUERY = DRAWS_FRAGMENT + (
+    "fragment lotteryStatFragment on LotteryStat {\n"
+    "  year\n  no\n  drawDate\n  drawnNumbers { lastDrawnIn totalNumber drawnNo }\n"
+    "}\n"
+    "query marksix {\n"
+    "  lotteryDraws { ...lotteryDrawsFragment }\n"
+    "  lotteryStats { ...lotteryStatFragment }\n"
+    "}\n"
+)
+
+# Past draws by date range (dates as YYYYMMDD, both ends inclusive)
+RESULTS_QUERY = DRAWS_FRAGMENT + (
+    "query marksixResult($lastNDraw: Int, $startDate: String, $endDate: String, "
+    "$drawType: LotteryDrawType) {\n"
+    "  lotteryDraws(lastNDraw: $lastNDraw, startDate: $startDate, endDate: $endDate, "
+    "drawType: $drawType) { ...lotteryDrawsFragment }\n"
+    "}\n"
+)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+REQUEST_SECONDS = Histogram(
+    "mark6_hkjc_request_seconds", "HKJC GraphQL query latency, retries included.", ["outcome"]
+)
+ERRORS = Counter("mark6_hkjc_errors_total", "Failed HKJC attempts by cause.", ["reason"])
+
+
+class HKJCError(Exception):
+    pass
+
+
+class HKJCClient:
+    """Async client for the HKJC GraphQL endpoint.
+
+    Keeps one pooled keep-alive connection per event loop, applies per-phase
+    timeouts and retries transport errors and 429/5xx responses with
+    exponential backoff.
+    """
+
+    def __init__(
+        self,
+        url: str = HKJC_GRAPHQL_URL,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        retries: int = 2,
+        backoff: float = 0.5,
+        max_connections: int = 4,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.url = url
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_connections = max_connections
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=max(2, self.max_connections // 2),
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def query(self, payload: Dict) -> Dict:
+        started = time.perf_counter()
+        try:
+            data = await self._query(payload)
+        except HKJCError:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="error")
+            raise
+        REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="ok")
+        return data
+
+    async def _query(self, payload: Dict) -> Dict:
+        client = self._get_client()
+        last_error: Optional[Exception] = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = self.backoff * (2 ** (attempt - 1))
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
+            try:
+                res = await client.post(self.url, json=payload)
+            except httpx.TransportError as e:
+                ERRORS.inc(reason="transport")
+                last_error = e
+                continue
+            if res.status_code in RETRY_STATUS_CODES:
+                ERRORS.inc(reason=f"http_{res.status_code}")
+                last_error = HKJCError(f"HKJC returned HTTP {res.status_code}")
+                continue
+            try:
+                res.raise_for_status()
+                data = res.json()
+            except (httpx.HTTPStatusError, ValueError) as e:
+                ERRORS.inc(reason="bad_response")
+                raise HKJCError(str(e)) from e
+            if data.get("errors") and not data.get("data"):
+                ERRORS.inc(reason="graphql")
+                raise HKJCError(f"HKJC GraphQL errors: {data['errors']}")
+            return data.get("data") or {}
+        raise HKJCError(f"HKJC request failed after {self.retries + 1} attempts: {last_error}")
+
+    async def fetch_draws(self) -> Optional[Dict]:
+        payload = {"operationName": "marksix", "variables": {}, "query": MARKSIX_QUERY}
+        try:
+            return await self.query(payload)
+        except HKJCError:
+            return None
+
+    async def fetch_results(self, start: date, end: date) -> List[Dict]:
+        """Draws held between `start` and `end`; raises HKJCError on failure."""
+        payload = {
+            "operationName": "marksixResult",
+            "variables": {
+                "lastNDraw": None,
+                "startDate": start.strftime("%Y%m%d"),
+                "endDate": end.strftime("%Y%m%d"),
+                "drawType": "All",
+            },
+            "query": RESULTS_QUERY,
+        }
+        data = await self.query(payload)
+        return data.get("lotteryDraws") or []
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class CachedFetch:
+    """TTL cache with single-flight coalescing around an async fetch.
+
+    Within `ttl` the cached value is returned as is. Up to `stale_ttl` after
+    that, the stale value is returned immediately while one background
+    refresh runs. Concurrent callers that find no usable value share a single
+    in-flight fetch. A failed fetch (None) never replaces a cached value.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[Optional[Dict]]],
+        ttl: float = 30.0,
+        stale_ttl: float = 300.0,
+    ) -> None:
+        self._fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._value: Optional[Dict] = None
+        self._fetched_at = 0.0
+        self._inflight: Optional[asyncio.Future] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def _age(self) -> float:
+        return time.monotonic() - self._fetched_at
+
+    async def _refresh(self) -> Optional[Dict]:
+        try:
+            value = await self._fetch()
+        except Exception:
+            value = None
+        if value is None:
+            self.errors += 1
+        else:
+            self._value = value
+            self._fetched_at = time.monotonic()
+        return value if value is not None else self._value
+
+    def _start_refresh(self) -> asyncio.Future:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._refresh())
+        return self._inflight
+
+    async def get(self) -> Optional[Dict]:
+        if self._value is not None:
+            age = self._age()
+            if age < self.ttl:
+                self.hits += 1
+                return self._value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._start_refresh()
+                return self._value
+        if self._inflight is not None and not self._inflight.done():
+            self.coalesced += 1
+        else:
+            self.misses += 1
+        # shield: one caller being cancelled must not cancel the shared fetch
+        return await asyncio.shield(self._start_refresh())
+
+    async def refresh(self) -> Optional[Dict]:
+        """Fetch now (joining any in-flight fetch) regardless of age."""
+        self.misses += 1
+        return await asyncio.shield(self._start_refresh())
+
+    def invalidate(self) -> None:
+        self._value = None
+        self._fetched_at = 0.0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+        }
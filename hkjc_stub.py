@@ -0,0 +1,105 @@
+"""Local stand-in for the HKJC GraphQL endpoint that replays recorded draws.
+
+Record a fixture with `backfill.py --record fixtures.json`, then point the
+backfill (or the bot, via MARK6_HKJC_URL) at the stub:
+
+    python hkjc_stub.py fixtures.json --port 8765 --fail-rate 0.2
+    python backfill.py --start 2024-01-01 --url http://127.0.0.1:8765/
+
+Date-range queries are answered by filtering the fixture on draw date, and
+the `marksix` query returns the most recent draws. `--fail-rate` answers
+that share of requests with a 503, to exercise retries and resuming.
+"""
+
+import argparse
+import json
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+LATEST_DRAWS = 5
+
+
+def load_fixture(path: str) -> List[Dict]:
+    """Draws from a recorded fixture, newest first.
+
+    Accepts a bare list, {"lotteryDraws": [...]} or a full GraphQL response.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = (data.get("data") or data).get("lotteryDraws") or []
+    return sorted(data, key=lambda d: d.get("drawDate") or "", reverse=True)
+
+
+def _day(value: Optional[str]) -> str:
+    """YYYYMMDD from a query variable or an ISO draw date."""
+    return (value or "").replace("-", "")[:8]
+
+
+def answer(draws: List[Dict], payload: Dict) -> Dict:
+    if payload.get("operationName") == "marksix":
+        return {"data": {"lotteryDraws": draws[:LATEST_DRAWS], "lotteryStats": []}}
+    variables = payload.get("variables") or {}
+    start, end = _day(variables.get("startDate")), _day(variables.get("endDate"))
+    if not start or not end:
+        return {"errors": [{"message": "startDate and endDate are required"}]}
+    selected = [d for d in draws if start <= _day(d.get("drawDate")) <= end]
+    if variables.get("lastNDraw"):
+        selected = selected[: int(variables["lastNDraw"])]
+    return {"data": {"lotteryDraws": selected}}
+
+
+def make_handler(draws: List[Dict], fail_rate: float = 0.0, rng: Optional[random.Random] = None):
+    rng = rng or random.Random()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if rng.random() < fail_rate:
+                self._reply(503, {"errors": [{"message": "injected failure"}]})
+                return
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                self._reply(400, {"errors": [{"message": "invalid JSON"}]})
+                return
+            self._reply(200, answer(draws, payload))
+
+        def _reply(self, status: int, data: Dict) -> None:
+            encoded = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded HKJC draws over GraphQL.")
+    parser.add_argument("fixture", help="JSON file written by backfill.py --record")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--seed", type=int, help="seed for injected failures")
+    args = parser.parse_args()
+
+    draws = load_fixture(args.fixture)
+    handler = make_handler(draws, args.fail_rate, random.Random(args.seed))
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Serving {len(draws)} draw(s) on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
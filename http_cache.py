@@ -0,0 +1,174 @@
+import gzip
+import hashlib
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, Tuple
+
+from flask import Flask, Response, g, make_response, request
+
+from metrics import Histogram
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/plain", "text/css", "application/javascript")
+MIN_COMPRESS_BYTES = 500
+_ENCODING_SUFFIX = {"br": "-br", "gzip": "-gz"}
+
+REQUEST_SECONDS = Histogram(
+    "mark6_http_request_duration_seconds", "Flask request latency by route.", ["method", "route", "status"]
+)
+
+
+class RenderCache:
+    """Rendered HTML kept in memory per key until the data version changes.
+
+    Each key holds one entry; a lookup with a different version re-renders
+    and replaces it, so memory stays bounded by the number of keys. Safe to
+    share between threaded workers; rendering happens outside the lock.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, Tuple[str, str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.render_seconds = 0.0
+        self.last_render_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, version: str, render: Callable[[], str]) -> str:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        started = time.perf_counter()
+        html = render()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.last_render_seconds = elapsed
+            self.render_seconds += elapsed
+            self._entries[key] = (version, html)
+        return html
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits, misses, entries = self.hits, self.misses, len(self._entries)
+            render_seconds, last_render_seconds = self.render_seconds, self.last_render_seconds
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "render_seconds_total": render_seconds,
+            "last_render_ms": last_render_seconds * 1000,
+            "avg_render_ms": render_seconds * 1000 / misses if misses else 0.0,
+        }
+
+
+def data_etag(version: str) -> str:
+    """Strong ETag for this URL at a given data version."""
+    return hashlib.sha256(f"{version}:{request.full_path}".encode("utf-8")).hexdigest()[:32]
+
+
+def _matches(etag: str) -> bool:
+    # Compressed variants carry a suffixed ETag; any of them validates
+    candidates = [etag] + [etag + suffix for suffix in _ENCODING_SUFFIX.values()]
+    return any(request.if_none_match.contains(c) for c in candidates)
+
+
+def conditional(version: Callable[[], str], cache_control: str) -> Callable:
+    """Decorate a GET view with a data-version ETag, Cache-Control and 304s.
+
+    `version` returns the current data version. A matching If-None-Match is
+    answered with 304 before the view runs.
+    """
+
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = data_etag(version())
+            if _matches(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = cache_control
+            response.vary.add("Accept-Encoding")
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _pick_encoding() -> str:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return ""
+
+
+def compress_response(response: Response) -> Response:
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_TYPES
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = _pick_encoding()
+    data = response.get_data()
+    if not encoding or len(data) < MIN_COMPRESS_BYTES:
+        return response
+
+    if encoding == "br":
+        body = brotli.compress(data, quality=5)
+    else:
+        body = gzip.compress(data, compresslevel=6)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + _ENCODING_SUFFIX[encoding], weak=weak)
+    return response
+
+
+def init_compression(app: Flask) -> None:
+    app.after_request(compress_response)
+
+
+def _start_timer() -> None:
+    g.request_started = time.perf_counter()
+
+
+def _record_latency(response: Response) -> Response:
+    started = g.pop("request_started", None)
+    if started is not None:
+        # The URL rule, not the path, keeps label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - started, method=request.method, route=route, status=response.status_code
+        )
+    return response
+
+
+def init_request_metrics(app: Flask) -> None:
+    """Time every request; call before other after_request hooks so they are included."""
+    app.before_request(_start_timer)
+    app.after_request(_record_latency)
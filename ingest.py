@@ -0,0 +1,395 @@
+"""Streaming ingestion of draw results from several sources into the store.
+
+Each source adapter yields one raw record at a time; records then flow
+through shared stages: normalize (parse dates, draw numbers and numbers),
+validate (1-49, six distinct numbers, bonus not among them) and dedupe
+(against a draw-number index, first source wins). Accepted draws and the
+index live in a temporary SQLite file keyed by year and draw number, so
+reading and deduplicating take constant memory whatever the input size.
+The result is written straight to the store, CSV plus columnar copy; only
+that last step holds the merged history in memory, as the columnar copy
+is built from whole arrays:
+
+    python ingest.py "Historical Mark 6 Results - All.csv" mark6_results.md
+    python ingest.py --merge fixtures.json backfill_progress.jsonl
+    python ingest.py --dry-run --rejects rejects.jsonl old_export.csv
+
+Source kinds are picked from the extension (.csv, .md, .json, .jsonl) or
+given as a prefix, e.g. `md:notes.txt`. CSV title lines above the header row
+are skipped, and the usual header spellings are recognized.
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+
+from draw_store import DEFAULT_CSV_PATH, DrawHistory, atomic_write, columnar_path, file_sha256, write_columnar
+from update_results import EXPECTED_COLUMNS, draw_key
+
+MAX_NUMBER = 49
+
+# Lower-cased header spellings seen in exports -> store column
+COLUMN_ALIASES = {
+    "date": "date",
+    "draw date": "date",
+    "draw_date": "date",
+    "draw_number": "draw_number",
+    "draw number": "draw_number",
+    "draw no.": "draw_number",
+    "bonus": "bonus",
+    "extra": "bonus",
+    "extra/ bonus number": "bonus",
+    "extra number": "bonus",
+}
+for _i, _ordinal in enumerate(["1st", "2nd", "3rd", "4th", "5th", "6th"], start=1):
+    COLUMN_ALIASES[f"num_{_i}"] = f"num_{_i}"
+    COLUMN_ALIASES[f"{_ordinal} number"] = f"num_{_i}"
+    COLUMN_ALIASES[f"no. {_i}"] = f"num_{_i}"
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d", "%d-%m-%Y", "%Y%m%d")
+
+_MD_LINE = re.compile(r"- ([\d/]+) — ([\d-]+) — Numbers: ([\d, ]+); Extra: (\d+)")
+
+RawRecord = Dict[str, object]
+Draw = Tuple[int, Tuple[int, int], str, Tuple[int, ...], int]  # ordinal, key, draw number, numbers, bonus
+
+
+class Rejected(ValueError):
+    """A record that cannot go into the store; the message is the reason."""
+
+
+# Source adapters: each yields raw records with store field names
+
+def csv_records(path: str) -> Iterator[RawRecord]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        columns: Optional[List[Optional[str]]] = None
+        for row in reader:
+            if columns is None:
+                # Title lines come before the header row in some exports
+                mapped = [COLUMN_ALIASES.get(c.strip().lower()) for c in row]
+                if "date" in mapped and "draw_number" in mapped:
+                    columns = mapped
+                continue
+            if not any(cell.strip() for cell in row):
+                continue
+            record: RawRecord = {}
+            numbers = []
+            for name, cell in zip(columns, row):
+                if name is None:
+                    continue
+                if name.startswith("num_"):
+                    numbers.append(cell)
+                else:
+                    record[name] = cell
+            record["numbers"] = numbers
+            yield record
+    if columns is None:
+        raise ValueError(f"{path}: no header row with date and draw number columns")
+
+
+def markdown_records(path: str) -> Iterator[RawRecord]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.startswith("-"):
+                continue
+            match = _MD_LINE.search(line)
+            if match:
+                yield {
+                    "draw_number": match.group(1),
+                    "date": match.group(2),
+                    "numbers": match.group(3).split(","),
+                    "bonus": match.group(4),
+                }
+
+
+def _hkjc_record(draw: Dict) -> RawRecord:
+    result = draw.get("drawResult") or {}
+    year, number = draw.get("year"), draw.get("no")
+    return {
+        "date": (draw.get("drawDate") or "")[:10],
+        "draw_number": f"{year}/{number}" if year and number else draw.get("id"),
+        "numbers": result.get("drawnNo") or [],
+        "bonus": result.get("xDrawnNo"),
+        "status": draw.get("status"),
+    }
+
+
+def hkjc_records(path: str) -> Iterator[RawRecord]:
+    """HKJC `lotteryDraws` objects.
+
+    A .jsonl file is read a line at a time; each line is one draw or a
+    backfill checkpoint entry. A .json file (a list, {"lotteryDraws": ...}
+    or a full GraphQL response) is parsed whole.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                for draw in item.get("draws", [item]) if isinstance(item, dict) else []:
+                    yield _hkjc_record(draw)
+            return
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = (data.get("data") or data).get("lotteryDraws") or []
+    for draw in data:
+        yield _hkjc_record(draw)
+
+
+ADAPTERS: Dict[str, Callable[[str], Iterator[RawRecord]]] = {
+    "csv": csv_records,
+    "md": markdown_records,
+    "hkjc": hkjc_records,
+}
+_EXTENSIONS = {".csv": "csv", ".md": "md", ".json": "hkjc", ".jsonl": "hkjc"}
+
+
+def parse_source(spec: str) -> Tuple[str, str]:
+    """'kind:path' or a path whose extension names the kind."""
+    kind, sep, path = spec.partition(":")
+    if sep and kind in ADAPTERS:
+        return kind, path
+    kind = _EXTENSIONS.get(os.path.splitext(spec)[1].lower())
+    if kind is None:
+        raise ValueError(f"Cannot tell the kind of source {spec!r}; prefix it with csv:, md: or hkjc:.")
+    return kind, spec
+
+
+# Shared stages
+
+def _int(value: object, field: str) -> int:
+    try:
+        return int(float(str(value).strip()))
+    except (TypeError, ValueError):
+        raise Rejected(f"bad {field}")
+
+
+def parse_day(value: object) -> date:
+    text = str(value or "").strip()[:10]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise Rejected("bad date")
+
+
+def normalize(record: RawRecord) -> Draw:
+    """Typed draw from a raw record: date ordinal, (year, number) key, 'YY/N', numbers, bonus."""
+    status = record.get("status")
+    if status is not None and str(status).lower() != "result":
+        raise Rejected("not a result")
+    try:
+        year, number = draw_key(record.get("draw_number") or "")
+    except ValueError:
+        raise Rejected("bad draw number")
+    numbers = tuple(_int(n, "number") for n in record.get("numbers") or [])
+    bonus = _int(record.get("bonus"), "bonus")
+    return parse_day(record.get("date")).toordinal(), (year % 100, number), f"{year % 100:02d}/{number}", numbers, bonus
+
+
+def validate(draw: Draw) -> Draw:
+    _, _, _, numbers, bonus = draw
+    if len(numbers) != 6:
+        raise Rejected("not six numbers")
+    if len(set(numbers)) != 6:
+        raise Rejected("repeated number")
+    if min(numbers) < 1 or max(numbers) > MAX_NUMBER or not 1 <= bonus <= MAX_NUMBER:
+        raise Rejected("number out of range")
+    if bonus in numbers:
+        raise Rejected("bonus among the numbers")
+    return draw
+
+
+class StageStats:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.records = 0
+        self.passed = 0
+        self.seconds = 0.0
+
+    def rate(self) -> float:
+        return self.records / self.seconds if self.seconds else 0.0
+
+
+class Pipeline:
+    """Runs sources through the stages, keeping one row per draw number.
+
+    Kept draws go to a temporary SQLite file whose primary key is the
+    dedupe index; `close` deletes it.
+    """
+
+    def __init__(self, rejects: Optional[TextIO] = None, workdir: Optional[str] = None) -> None:
+        self.stages = {name: StageStats(name) for name in ("read", "normalize", "validate", "dedupe")}
+        self.rejected: Dict[str, int] = {}
+        self.accepted = 0
+        self._rejects = rejects
+        fd, self._db_path = tempfile.mkstemp(prefix="mark6-ingest-", suffix=".sqlite", dir=workdir)
+        os.close(fd)
+        self._db = sqlite3.connect(self._db_path)
+        # Scratch data: nothing to recover after a crash
+        self._db.execute("PRAGMA journal_mode = OFF")
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.execute(
+            "CREATE TABLE draws (year INTEGER, number INTEGER, ordinal INTEGER, draw_number TEXT,"
+            " n1 INTEGER, n2 INTEGER, n3 INTEGER, n4 INTEGER, n5 INTEGER, n6 INTEGER, bonus INTEGER,"
+            " PRIMARY KEY (year, number)) WITHOUT ROWID"
+        )
+
+    def close(self) -> None:
+        self._db.close()
+        if os.path.exists(self._db_path):
+            os.remove(self._db_path)
+
+    def _reject(self, source: str, record: RawRecord, reason: str) -> None:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        if self._rejects is not None:
+            self._rejects.write(json.dumps({"source": source, "reason": reason, "record": record}, default=str) + "\n")
+
+    def feed(self, source: str, records: Iterable[RawRecord]) -> None:
+        read, normalized, validated, deduped = self.stages.values()
+        clock = time.perf_counter
+        iterator = iter(records)
+        while True:
+            started = clock()
+            record = next(iterator, None)
+            read.seconds += clock() - started
+            if record is None:
+                break
+            read.records += 1
+            read.passed += 1
+
+            started = clock()
+            normalized.records += 1
+            try:
+                draw = normalize(record)
+                normalized.passed += 1
+            except Rejected as e:
+                self._reject(source, record, str(e))
+                continue
+            finally:
+                normalized.seconds += clock() - started
+
+            started = clock()
+            validated.records += 1
+            try:
+                validate(draw)
+                validated.passed += 1
+            except Rejected as e:
+                self._reject(source, record, str(e))
+                continue
+            finally:
+                validated.seconds += clock() - started
+
+            started = clock()
+            deduped.records += 1
+            ordinal, key, draw_number, numbers, bonus = draw
+            kept = self._db.execute(
+                "SELECT n1, n2, n3, n4, n5, n6, bonus FROM draws WHERE year = ? AND number = ?", key
+            ).fetchone()
+            if kept is None:
+                self._db.execute(
+                    "INSERT INTO draws VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (*key, ordinal, draw_number, *numbers, bonus),
+                )
+                self.accepted += 1
+                deduped.passed += 1
+            elif set(kept[:6]) != set(numbers) or kept[6] != bonus:
+                self._reject(source, record, "conflicts with an earlier row")
+            else:
+                self.rejected["duplicate"] = self.rejected.get("duplicate", 0) + 1
+            deduped.seconds += clock() - started
+
+    def history(self) -> DrawHistory:
+        """Accepted draws as a history, newest first."""
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT ordinal, draw_number, n1, n2, n3, n4, n5, n6, bonus FROM draws"
+            " ORDER BY ordinal DESC, year DESC, number DESC"
+        )
+        dates = np.empty(self.accepted, dtype=np.int32)
+        numbers = np.empty((self.accepted, 6), dtype=np.uint8)
+        bonus = np.empty(self.accepted, dtype=np.uint8)
+        draw_numbers: List[str] = []
+        for i, row in enumerate(rows):
+            dates[i] = row[0]
+            draw_numbers.append(row[1])
+            numbers[i] = row[2:8]
+            bonus[i] = row[8]
+        return DrawHistory(dates=dates, draw_numbers=draw_numbers, numbers=numbers, bonus=bonus, version=0)
+
+    def report(self) -> List[str]:
+        lines = [f"{'stage':<10}{'in':>10}{'out':>10}{'seconds':>10}{'rows/s':>12}"]
+        for s in self.stages.values():
+            lines.append(f"{s.name:<10}{s.records:>10}{s.passed:>10}{s.seconds:>10.3f}{s.rate():>12,.0f}")
+        for reason, count in sorted(self.rejected.items(), key=lambda item: -item[1]):
+            lines.append(f"  dropped ({reason}): {count}")
+        return lines
+
+
+def write_store(history: DrawHistory, path: str = DEFAULT_CSV_PATH) -> str:
+    """Atomically write `history` as the results CSV plus its columnar copy."""
+    with atomic_write(path, newline="") as f:
+        f.write(",".join(EXPECTED_COLUMNS) + "\n")
+        for i in range(len(history)):
+            numbers = ",".join(str(n) for n in history.numbers[i])
+            f.write(f"{history.date_str(i)},{history.draw_numbers[i]},{numbers},{history.bonus[i]}\n")
+    history.source_hash = file_sha256(path)
+    write_columnar(history, columnar_path(path))
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Merge draw results from several sources into the store.")
+    parser.add_argument("sources", nargs="+", help="files to read, e.g. a.csv b.md md:notes.txt hkjc:draws.json")
+    parser.add_argument("--output", default=DEFAULT_CSV_PATH)
+    parser.add_argument("--merge", action="store_true", help="read the current output first; its rows win")
+    parser.add_argument("--rejects", help="write dropped records to this JSON-lines file")
+    parser.add_argument("--dry-run", action="store_true", help="report without writing the store")
+    args = parser.parse_args()
+
+    try:
+        sources = [parse_source(s) for s in args.sources]
+    except ValueError as e:
+        parser.error(str(e))
+    if args.merge and os.path.exists(args.output):
+        sources.insert(0, ("csv", args.output))
+
+    rejects = open(args.rejects, "w") if args.rejects else None
+    pipeline = Pipeline(rejects)
+    started = time.perf_counter()
+    try:
+        try:
+            for kind, path in sources:
+                before = pipeline.accepted
+                pipeline.feed(path, ADAPTERS[kind](path))
+                print(f"{path}: {pipeline.accepted - before} new draw(s)")
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        finally:
+            if rejects is not None:
+                rejects.close()
+        elapsed = time.perf_counter() - started
+        print("\n".join(pipeline.report()))
+        print(f"{pipeline.accepted} draw(s) in {elapsed:.2f}s")
+        if args.dry_run:
+            return
+        print(f"Written to {write_store(pipeline.history(), args.output)} and {columnar_path(args.output)}")
+    finally:
+        pipeline.close()
+
+
+if __name__ == "__main__":
+    main()
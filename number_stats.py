@@ -0,0 +1,136 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from draw_store import DrawHistory
+
+MAX_NUMBER = 49
+DEFAULT_WINDOW = 100
+
+
+class _Tally:
+    """Frequency and gap counters for one kind of hit (main numbers or bonus).
+
+    Arrays are indexed by number (0 unused). Positions count from the oldest
+    draw, so they stay valid as newer draws are added.
+    """
+
+    def __init__(self, presence: np.ndarray, window: int) -> None:
+        # presence: bool (n, 50), oldest draw first
+        n = len(presence)
+        self.count = presence.sum(axis=0, dtype=np.int32)
+        self.window_count = presence[max(0, n - window):].sum(axis=0, dtype=np.int32)
+        self.last_position = np.full(MAX_NUMBER + 1, -1, dtype=np.int64)
+        self.current_gap = np.full(MAX_NUMBER + 1, n, dtype=np.int64)
+        self.longest_gap = np.full(MAX_NUMBER + 1, n, dtype=np.int64)
+        for number in range(1, MAX_NUMBER + 1):
+            positions = np.flatnonzero(presence[:, number])
+            if len(positions) == 0:
+                continue
+            gaps = np.diff(np.concatenate([[-1], positions, [n]])) - 1
+            self.last_position[number] = positions[-1]
+            self.current_gap[number] = n - 1 - positions[-1]
+            self.longest_gap[number] = gaps.max()
+
+    def copy(self) -> "_Tally":
+        tally = _Tally.__new__(_Tally)
+        for name in ("count", "window_count", "last_position", "current_gap", "longest_gap"):
+            setattr(tally, name, getattr(self, name).copy())
+        return tally
+
+    def push(self, hits: np.ndarray, leaving: Optional[np.ndarray], position: int) -> None:
+        """Add one draw at `position`; `leaving` is the draw falling out of the window."""
+        self.current_gap += 1
+        self.count[hits] += 1
+        self.window_count[hits] += 1
+        if leaving is not None:
+            self.window_count[leaving] -= 1
+        self.current_gap[hits] = 0
+        self.last_position[hits] = position
+        np.maximum(self.longest_gap, self.current_gap, out=self.longest_gap)
+
+
+class NumberStats:
+    """Per-number frequency, windowed frequency, gaps and last draw.
+
+    Built once per snapshot and updated in O(1) per new draw via `extend`.
+    Gaps are counted in draws: a current gap of 0 means drawn in the latest
+    draw; the longest gap includes the current one.
+    """
+
+    def __init__(self, history: DrawHistory, window: int = DEFAULT_WINDOW) -> None:
+        self.window = window
+        self.size = len(history)
+        numbers = np.asarray(history.numbers)[::-1]
+        bonus = np.asarray(history.bonus)[::-1]
+        rows = np.arange(self.size)[:, None]
+        main = np.zeros((self.size, MAX_NUMBER + 1), dtype=bool)
+        main[rows, numbers] = True
+        extra = np.zeros((self.size, MAX_NUMBER + 1), dtype=bool)
+        extra[rows[:, 0], bonus] = True
+        self.main = _Tally(main, window)
+        self.bonus = _Tally(extra, window)
+
+    def extend(self, history: DrawHistory, added: DrawHistory) -> "NumberStats":
+        stats = NumberStats.__new__(NumberStats)
+        stats.window = self.window
+        stats.size = self.size
+        stats.main = self.main.copy()
+        stats.bonus = self.bonus.copy()
+        total = len(history)
+        for row in range(len(added) - 1, -1, -1):
+            leaving_position = stats.size - stats.window
+            leaving_row = total - 1 - leaving_position if leaving_position >= 0 else None
+            stats.main.push(
+                np.asarray(added.numbers[row], dtype=np.intp),
+                None if leaving_row is None else np.asarray(history.numbers[leaving_row], dtype=np.intp),
+                stats.size,
+            )
+            stats.bonus.push(
+                np.asarray([added.bonus[row]], dtype=np.intp),
+                None if leaving_row is None else np.asarray([history.bonus[leaving_row]], dtype=np.intp),
+                stats.size,
+            )
+            stats.size += 1
+        return stats
+
+    def _last_draw(self, history: DrawHistory, position: int) -> Optional[Dict]:
+        if position < 0:
+            return None
+        row = self.size - 1 - int(position)
+        return {"date": history.date_str(row), "draw_number": history.draw_numbers[row]}
+
+    def number(self, history: DrawHistory, number: int) -> Dict:
+        if number < 1 or number > MAX_NUMBER:
+            raise ValueError("Numbers must be between 1 and 49.")
+        result = {"number": number}
+        for kind, tally in (("main", self.main), ("bonus", self.bonus)):
+            result[kind] = {
+                "count": int(tally.count[number]),
+                "window_count": int(tally.window_count[number]),
+                "current_gap": int(tally.current_gap[number]),
+                "longest_gap": int(tally.longest_gap[number]),
+                "last_drawn": self._last_draw(history, tally.last_position[number]),
+            }
+        return result
+
+    def table(self, history: DrawHistory) -> List[Dict]:
+        return [self.number(history, n) for n in range(1, MAX_NUMBER + 1)]
+
+    def hot(self, k: int = 6) -> List[int]:
+        """Most drawn in the window; ties go to the most recently drawn."""
+        order = np.lexsort((self.main.current_gap[1:], -self.main.window_count[1:]))
+        return [int(n) + 1 for n in order[:k]]
+
+    def cold(self, k: int = 6) -> List[int]:
+        """Least drawn in the window; ties go to the longest current gap."""
+        order = np.lexsort((-self.main.current_gap[1:], self.main.window_count[1:]))
+        return [int(n) + 1 for n in order[:k]]
+
+
+def get_stats(history: DrawHistory, window: int = DEFAULT_WINDOW) -> NumberStats:
+    # Only the default window is kept (and extended) per snapshot; other
+    # windows are user-chosen, so building them on demand bounds memory.
+    if window != DEFAULT_WINDOW:
+        return NumberStats(history, window)
+    return history.derived("number_stats", NumberStats)
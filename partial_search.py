@@ -0,0 +1,89 @@
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from draw_store import DrawHistory
+
+MAX_NUMBER = 49
+
+if hasattr(np, "bitwise_count"):
+    def popcount(values: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(values)
+else:  # NumPy < 2.0
+    _BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(values: np.ndarray) -> np.ndarray:
+        as_bytes = np.ascontiguousarray(values, dtype=np.uint64).view(np.uint8)
+        return _BYTE_COUNTS[as_bytes].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+def number_mask(numbers: Iterable[int]) -> int:
+    """Bit n set for each number n in 1..49."""
+    mask = 0
+    for n in numbers:
+        n = int(n)
+        if n < 1 or n > MAX_NUMBER:
+            raise ValueError("Numbers must be between 1 and 49.")
+        mask |= 1 << n
+    return mask
+
+
+class DrawMasks:
+    """Each draw's six numbers and its bonus as 64-bit number masks."""
+
+    def __init__(self, history: DrawHistory) -> None:
+        one = np.uint64(1)
+        self.numbers = np.zeros(len(history), dtype=np.uint64)
+        for col in range(history.numbers.shape[1] if not history.empty else 0):
+            self.numbers |= one << history.numbers[:, col].astype(np.uint64)
+        self.bonus = one << history.bonus.astype(np.uint64)
+
+    def extend(self, history: DrawHistory, added: DrawHistory) -> "DrawMasks":
+        masks = DrawMasks(added)
+        masks.numbers = np.concatenate([masks.numbers, self.numbers])
+        masks.bonus = np.concatenate([masks.bonus, self.bonus])
+        return masks
+
+
+def get_masks(history: DrawHistory) -> DrawMasks:
+    return history.derived("draw_masks", DrawMasks)
+
+
+def find_partial_matches(
+    history: DrawHistory,
+    numbers: Iterable[int],
+    min_matches: int = 3,
+    include_bonus: bool = False,
+) -> List[Dict]:
+    """Every draw sharing at least `min_matches` numbers with `numbers`.
+
+    With `include_bonus`, a bonus number in the query counts as one more match.
+    Results are sorted by overlap, then newest draw first.
+    """
+    numbers = list(numbers)
+    query = number_mask(numbers)
+    if bin(query).count("1") != len(numbers):
+        raise ValueError("Numbers must not repeat.")
+    if history.empty:
+        return []
+
+    masks = get_masks(history)
+    query_mask = np.uint64(query)
+    matched = popcount(masks.numbers & query_mask).astype(np.int16)
+    bonus_hit = (masks.bonus & query_mask) != 0
+    overlap = matched + bonus_hit if include_bonus else matched
+
+    rows = np.flatnonzero(overlap >= min_matches)
+    order = np.lexsort((-history.dates[rows], -overlap[rows]))
+    rows = rows[order]
+
+    query_set = set(int(n) for n in numbers)
+    results = []
+    for row in rows:
+        result = history.draw(row)
+        result["matched_numbers"] = sorted(query_set.intersection(result["numbers"]))
+        result["matched"] = int(matched[row])
+        result["bonus_matched"] = bool(bonus_hit[row])
+        result["overlap"] = int(overlap[row])
+        results.append(result)
+    return results
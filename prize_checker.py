@@ -0,0 +1,215 @@
+import csv
+import io
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from draw_store import DrawHistory
+from partial_search import MAX_NUMBER, get_masks, popcount
+
+DIVISIONS = 7
+# Mark Six division indexed by 2 * main numbers matched + bonus matched;
+# 0 = no prize
+_DIVISION_TABLE = np.zeros(14, dtype=np.int8)
+_DIVISION_TABLE[[12, 13]] = 1
+_DIVISION_TABLE[[11, 10]] = [2, 3]
+_DIVISION_TABLE[[9, 8]] = [4, 5]
+_DIVISION_TABLE[[7, 6]] = [6, 7]
+
+# HK$ per simple entry, and per winning unit by division (index 0: no prize).
+# Divisions 4-7 pay fixed amounts; 1-3 share a pool, so theirs are typical
+# payouts for estimates only.
+UNIT_BET = 10
+DIVISION_PRIZES = np.array([0, 8_000_000, 1_000_000, 80_000, 9_600, 640, 320, 40], dtype=np.int64)
+
+# Bounds the (tickets x draws) intermediate to ~32 MB of uint64
+_CHUNK_CELLS = 4_000_000
+
+
+TICKET_FORMAT_ERROR = "A ticket must contain 6 integers between 1 and 49."
+
+
+def _ticket_number(value: Any) -> int:
+    """`value` as an int; refuses bools and fractions, which int() would truncate."""
+    if isinstance(value, (bool, np.bool_)):
+        raise ValueError(TICKET_FORMAT_ERROR)
+    if isinstance(value, (float, np.floating)):
+        if not float(value).is_integer():
+            raise ValueError(TICKET_FORMAT_ERROR)
+        return int(value)
+    try:
+        return int(value)
+    except (ValueError, TypeError, OverflowError):
+        raise ValueError(TICKET_FORMAT_ERROR)
+
+
+def validate_ticket(numbers: List[int]) -> List[int]:
+    try:
+        nums = sorted(_ticket_number(n) for n in numbers)
+    except TypeError:
+        raise ValueError(TICKET_FORMAT_ERROR)
+    if len(nums) != 6:
+        raise ValueError("Each ticket needs exactly 6 numbers.")
+    if len(set(nums)) != 6:
+        raise ValueError("Numbers on a ticket must not repeat.")
+    if nums[0] < 1 or nums[-1] > MAX_NUMBER:
+        raise ValueError("Numbers must be between 1 and 49.")
+    return nums
+
+
+def validate_tickets(items: List[Any]) -> Tuple[np.ndarray, np.ndarray, Dict[int, str]]:
+    """Validate many tickets at once, keeping the valid ones.
+
+    Returns the indices of valid items, their sorted numbers as (k, 6) uint8
+    and an error message per invalid index. A rectangular list of numbers is
+    checked in one vectorized pass; anything else falls back to per item.
+    """
+    arr = None
+    # Only plain ints take the vectorized path: the int64 cast would turn 6.7
+    # into 6 and True into 1
+    if all(isinstance(item, (list, tuple)) and all(type(n) is int for n in item) for item in items):
+        try:
+            arr = np.array(items, dtype=np.int64)
+        except (ValueError, TypeError, OverflowError):
+            arr = None
+    if arr is not None and arr.ndim == 2 and arr.shape[1] == 6:
+        arr.sort(axis=1)
+        ok = (arr[:, 0] >= 1) & (arr[:, -1] <= MAX_NUMBER) & (np.diff(arr, axis=1) > 0).all(axis=1)
+        valid_index = np.flatnonzero(ok)
+        errors = {}
+        for i in np.flatnonzero(~ok):
+            try:
+                validate_ticket(arr[i].tolist())
+            except ValueError as e:
+                errors[int(i)] = str(e)
+        return valid_index, arr[valid_index].astype(np.uint8), errors
+
+    valid_index, valid, errors = [], [], {}
+    for i, item in enumerate(items):
+        try:
+            numbers = item.replace(",", " ").split() if isinstance(item, str) else item
+            valid.append(validate_ticket(numbers))
+            valid_index.append(i)
+        except ValueError as e:
+            errors[i] = str(e)
+    return (
+        np.array(valid_index, dtype=np.intp),
+        np.array(valid, dtype=np.uint8).reshape(-1, 6),
+        errors,
+    )
+
+
+def parse_tickets(data: str, fmt: str = "csv") -> np.ndarray:
+    """Parse tickets from CSV (one ticket per row) or JSON into (m, 6) uint8.
+
+    JSON may be a list of tickets or {"tickets": [...]}, each ticket a list of
+    numbers or a "1,2,3,4,5,6" string. A non-numeric first CSV row is taken
+    as a header.
+    """
+    if fmt == "json":
+        payload = json.loads(data)
+        rows = payload.get("tickets", []) if isinstance(payload, dict) else payload
+        if not isinstance(rows, list):
+            raise ValueError('Send a JSON list of tickets or {"tickets": [...]}.')
+        rows = [r.replace(",", " ").split() if isinstance(r, str) else r for r in rows]
+    else:
+        rows = []
+        sample = data.replace(";", ",")
+        for line_no, row in enumerate(csv.reader(io.StringIO(sample)), start=1):
+            cells = [c for cell in row for c in cell.split()]
+            if not cells:
+                continue
+            if line_no == 1 and not all(c.lstrip("-").isdigit() for c in cells):
+                continue
+            rows.append(cells)
+    tickets = np.empty((len(rows), 6), dtype=np.uint8)
+    for i, row in enumerate(rows):
+        try:
+            tickets[i] = validate_ticket(row)
+        except ValueError as e:
+            raise ValueError(f"Ticket {i + 1}: {e}") from None
+    return tickets
+
+
+def ticket_masks(tickets: np.ndarray) -> np.ndarray:
+    """(..., 6) ticket numbers -> (...) uint64 number masks."""
+    tickets = np.asarray(tickets, dtype=np.uint64)
+    masks = np.zeros(tickets.shape[:-1], dtype=np.uint64)
+    for col in range(tickets.shape[-1]):
+        masks |= np.uint64(1) << tickets[..., col]
+    return masks
+
+
+def division(matched: int, bonus_matched: bool) -> int:
+    """Division won with `matched` main numbers (0 for no prize)."""
+    return int(_DIVISION_TABLE[2 * matched + int(bonus_matched)])
+
+
+def divisions_for(tickets: np.ndarray, numbers: np.ndarray, bonus: np.ndarray) -> np.ndarray:
+    """Division of ticket masks against draw masks, broadcasting like `&`."""
+    key = popcount(tickets & numbers).astype(np.uint8) << 1
+    key |= (tickets & bonus) != 0
+    return _DIVISION_TABLE.take(key)
+
+
+def score_tickets(history: DrawHistory, tickets: np.ndarray) -> np.ndarray:
+    """Division (1-7, 0 for none) of every ticket in every draw: (m, n) int8."""
+    tickets = np.asarray(tickets).reshape(-1, 6)
+    masks = ticket_masks(tickets)
+    draws = get_masks(history)
+    divisions = np.zeros((len(tickets), len(history)), dtype=np.int8)
+    step = max(1, _CHUNK_CELLS // max(1, len(history)))
+    for start in range(0, len(tickets), step):
+        chunk = masks[start:start + step, None]
+        divisions[start:start + step] = divisions_for(chunk, draws.numbers[None, :], draws.bonus[None, :])
+    return divisions
+
+
+def division_counts(divisions: np.ndarray) -> np.ndarray:
+    """(m, n) divisions -> (m, 8) counts per division; column 0 is no prize."""
+    counts = np.empty((divisions.shape[0], DIVISIONS + 1), dtype=np.int64)
+    for d in range(DIVISIONS + 1):
+        counts[:, d] = np.count_nonzero(divisions == d, axis=1)
+    return counts
+
+
+def check_tickets(
+    history: DrawHistory, tickets: np.ndarray, include_draws: bool = True, max_division: int = DIVISIONS
+) -> Dict:
+    """Backtest tickets against the whole history.
+
+    Returns per-ticket counts for divisions 1-7 and, with `include_draws`,
+    the winning draws (division <= `max_division`), newest first.
+    """
+    divisions = score_tickets(history, tickets)
+    counts = division_counts(divisions)
+    results = []
+    for i, ticket in enumerate(tickets):
+        result = {
+            "ticket": [int(n) for n in ticket],
+            "divisions": {str(d): int(counts[i, d]) for d in range(1, DIVISIONS + 1)},
+        }
+        if include_draws:
+            rows = np.flatnonzero((divisions[i] > 0) & (divisions[i] <= max_division))
+            result["wins"] = [
+                {
+                    "division": int(divisions[i, row]),
+                    "date": history.date_str(row),
+                    "draw_number": history.draw_numbers[row],
+                }
+                for row in rows
+            ]
+        results.append(result)
+    totals = counts.sum(axis=0)
+    return {
+        "draws": len(history),
+        "tickets": len(tickets),
+        "totals": {str(d): int(totals[d]) for d in range(1, DIVISIONS + 1)},
+        "results": results,
+    }
+
+
+def check_ticket(history: DrawHistory, numbers: List[int], max_division: Optional[int] = None) -> Dict:
+    tickets = np.array([validate_ticket(numbers)], dtype=np.uint8)
+    return check_tickets(history, tickets, max_division=max_division or DIVISIONS)["results"][0]
@@ -0,0 +1,271 @@
+"""Monte Carlo estimates for questions the draw history cannot answer.
+
+Draws are simulated as vectorized batches of number masks. The work is cut
+into fixed-size jobs, each with its own SeedSequence child, so a seed gives
+the same answer on any number of workers. Jobs return small histograms
+that are summed as they finish, and only a bounded number are in flight at
+once, so memory stays flat however many draws are simulated:
+
+    python simulate.py --draws 1e9 --horizon 100 --workers 8
+    python simulate.py --draws 1e7 --numbers 3,11,19,27,35,43
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from math import comb
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from partial_search import MAX_NUMBER, popcount
+from prize_checker import DIVISIONS, division, divisions_for, ticket_masks, validate_ticket
+
+DEFAULT_HORIZON = 100  # draws, a little under a year
+MAX_HORIZON = 100_000
+JOB_DRAWS = 1 << 22  # draws per job and per RNG stream
+BATCH_DRAWS = 1 << 18  # draws held in memory at once within a job
+MAX_SUM = 6 * MAX_NUMBER
+ODD_MASK = np.uint64(sum(1 << n for n in range(1, MAX_NUMBER + 1, 2)))
+
+
+class Tally:
+    """Histograms summed across jobs."""
+
+    def __init__(self) -> None:
+        self.draws = 0
+        self.trials = 0
+        self.sums = np.zeros(MAX_SUM + 1, dtype=np.int64)
+        self.odd = np.zeros(7, dtype=np.int64)
+        self.divisions = np.zeros(DIVISIONS + 1, dtype=np.int64)
+        # Per horizon-long trial: most numbers matched and best division won
+        self.best_match = np.zeros(7, dtype=np.int64)
+        self.best_division = np.zeros(DIVISIONS + 1, dtype=np.int64)
+
+    def add(self, other: "Tally") -> None:
+        self.draws += other.draws
+        self.trials += other.trials
+        for name in ("sums", "odd", "divisions", "best_match", "best_division"):
+            getattr(self, name).__iadd__(getattr(other, name))
+
+
+def random_draws(rng: np.random.Generator, count: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """`count` uniform draws: (count, 6) numbers (unsorted), their masks and a bonus.
+
+    Six numbers are drawn with replacement and rows with a repeat are redrawn
+    (about 27% of them); the bonus is redrawn until it is not a main number.
+    """
+    numbers = rng.integers(1, MAX_NUMBER + 1, size=(count, 6), dtype=np.uint8)
+    masks = ticket_masks(numbers)
+    redo = np.flatnonzero(popcount(masks) != 6)
+    while len(redo):
+        numbers[redo] = rng.integers(1, MAX_NUMBER + 1, size=(len(redo), 6), dtype=np.uint8)
+        masks[redo] = ticket_masks(numbers[redo])
+        redo = redo[popcount(masks[redo]) != 6]
+    bonus = rng.integers(1, MAX_NUMBER + 1, size=count, dtype=np.uint8)
+    redo = np.flatnonzero((masks >> bonus.astype(np.uint64)) & np.uint64(1))
+    while len(redo):
+        bonus[redo] = rng.integers(1, MAX_NUMBER + 1, size=len(redo), dtype=np.uint8)
+        redo = redo[((masks[redo] >> bonus[redo].astype(np.uint64)) & np.uint64(1)) != 0]
+    return numbers, masks, np.uint64(1) << bonus.astype(np.uint64)
+
+
+def simulate_job(seed: np.random.SeedSequence, trials: int, horizon: int, ticket: Sequence[int]) -> Tally:
+    """`trials` runs of `horizon` draws each, played with `ticket`."""
+    rng = np.random.default_rng(seed)
+    mask = ticket_masks(np.asarray(ticket, dtype=np.uint8))
+    tally = Tally()
+    per_batch = max(1, BATCH_DRAWS // horizon)
+    for start in range(0, trials, per_batch):
+        batch = min(per_batch, trials - start)
+        numbers, masks, bonus = random_draws(rng, batch * horizon)
+        tally.sums += np.bincount(numbers.sum(axis=1, dtype=np.int64), minlength=MAX_SUM + 1)
+        tally.odd += np.bincount(popcount(masks & ODD_MASK), minlength=7)
+        matched = popcount(masks & mask).reshape(batch, horizon)
+        divisions = divisions_for(mask, masks, bonus).reshape(batch, horizon)
+        tally.divisions += np.bincount(divisions.ravel(), minlength=DIVISIONS + 1)
+        tally.best_match += np.bincount(matched.max(axis=1), minlength=7)
+        # Division 0 means no prize, so rank it after division 7
+        best = np.where(divisions == 0, DIVISIONS + 1, divisions).min(axis=1)
+        tally.best_division += np.bincount(np.where(best > DIVISIONS, 0, best), minlength=DIVISIONS + 1)
+        tally.draws += batch * horizon
+        tally.trials += batch
+    return tally
+
+
+def _jobs(total_trials: int, horizon: int, seed: int) -> Iterator[Tuple[np.random.SeedSequence, int]]:
+    per_job = max(1, JOB_DRAWS // horizon)
+    count = -(-total_trials // per_job)
+    for i, child in enumerate(np.random.SeedSequence(seed).spawn(count)):
+        yield child, min(per_job, total_trials - i * per_job)
+
+
+def exact_divisions() -> np.ndarray:
+    """Probability of each division (index 0: no prize) for one ticket in one draw."""
+    total = comb(MAX_NUMBER, 6)
+    probs = np.zeros(DIVISIONS + 1)
+    for matched in range(7):
+        p = comb(6, matched) * comb(MAX_NUMBER - 6, 6 - matched) / total
+        # The bonus is one of the 43 numbers not drawn as main numbers
+        with_bonus = (6 - matched) / (MAX_NUMBER - 6)
+        probs[division(matched, True)] += p * with_bonus
+        probs[division(matched, False)] += p * (1 - with_bonus)
+    return probs
+
+
+def exact_matches() -> np.ndarray:
+    """Probability that a ticket shares exactly k numbers with one draw."""
+    total = comb(MAX_NUMBER, 6)
+    return np.array([comb(6, k) * comb(MAX_NUMBER - 6, 6 - k) / total for k in range(7)])
+
+
+def _estimate(hits: int, trials: int, exact: float) -> Dict:
+    p = hits / trials if trials else 0.0
+    return {
+        "estimate": p,
+        "stderr": (p * (1 - p) / trials) ** 0.5 if trials else 0.0,
+        "exact": exact,
+    }
+
+
+def _percentile(histogram: np.ndarray, q: float) -> int:
+    cumulative = np.cumsum(histogram)
+    return int(np.searchsorted(cumulative, q * cumulative[-1]))
+
+
+def summarize(tally: Tally, horizon: int, ticket: Sequence[int], seed: int) -> Dict:
+    per_draw_match = exact_matches()
+    per_draw_division = exact_divisions()
+    no_prize = per_draw_division[0]
+    odd_total = (MAX_NUMBER + 1) // 2
+    sums = tally.sums
+    values = np.arange(len(sums))
+    mean = float(values @ sums / sums.sum())
+    return {
+        "draws": tally.draws,
+        "trials": tally.trials,
+        "horizon": horizon,
+        "ticket": [int(n) for n in ticket],
+        "seed": seed,
+        "at_least_within_horizon": {
+            str(k): _estimate(
+                int(tally.best_match[k:].sum()),
+                tally.trials,
+                1 - (1 - per_draw_match[k:].sum()) ** horizon,
+            )
+            for k in range(1, 7)
+        },
+        "prize_within_horizon": _estimate(
+            tally.trials - int(tally.best_division[0]), tally.trials, 1 - no_prize ** horizon
+        ),
+        "per_draw_divisions": {
+            str(d): _estimate(int(tally.divisions[d]), tally.draws, float(per_draw_division[d]))
+            for d in range(1, DIVISIONS + 1)
+        },
+        "sum": {
+            "mean": mean,
+            "std": float(np.sqrt(((values - mean) ** 2) @ sums / sums.sum())),
+            "p5": _percentile(sums, 0.05),
+            "median": _percentile(sums, 0.5),
+            "p95": _percentile(sums, 0.95),
+            "histogram": {str(v): int(sums[v]) for v in np.flatnonzero(sums)},
+        },
+        "odd_count": {
+            str(k): _estimate(
+                int(tally.odd[k]), tally.draws,
+                comb(odd_total, k) * comb(MAX_NUMBER - odd_total, 6 - k) / comb(MAX_NUMBER, 6),
+            )
+            for k in range(7)
+        },
+    }
+
+
+def simulate(
+    draws: int,
+    horizon: int = DEFAULT_HORIZON,
+    ticket: Optional[Sequence[int]] = None,
+    seed: int = 0,
+    workers: int = 1,
+) -> Dict:
+    """Simulate about `draws` draws as trials of `horizon` draws each.
+
+    Without a `ticket`, a random one is picked from `seed`. Every ticket has
+    the same odds, including never-drawn ones, which is what the exact
+    figures next to each estimate show.
+    """
+    if horizon < 1 or horizon > MAX_HORIZON:
+        raise ValueError(f"horizon must be between 1 and {MAX_HORIZON}.")
+    trials = max(1, draws // horizon)
+    if ticket is None:
+        ticket = np.sort(np.random.default_rng(seed).choice(MAX_NUMBER, 6, replace=False) + 1)
+    ticket = validate_ticket(ticket)
+    tally = Tally()
+    jobs = _jobs(trials, horizon, seed)
+    if workers <= 1:
+        for child, count in jobs:
+            tally.add(simulate_job(child, count, horizon, ticket))
+        return summarize(tally, horizon, ticket, seed)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for child, count in jobs:
+            # Bounded in-flight jobs: results are folded in as they finish
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tally.add(future.result())
+            pending.add(pool.submit(simulate_job, child, count, horizon, ticket))
+        for future in pending:
+            tally.add(future.result())
+    return summarize(tally, horizon, ticket, seed)
+
+
+def format_summary(result: Dict) -> List[str]:
+    ticket = ", ".join(str(n) for n in result["ticket"])
+    lines = [
+        f"{result['draws']:,} simulated draws, {result['trials']:,} runs of {result['horizon']} draws",
+        f"Ticket {ticket}; chance within {result['horizon']} draws (exact in brackets):",
+    ]
+    for k in ("3", "4", "5", "6"):
+        e = result["at_least_within_horizon"][k]
+        lines.append(f"  {k}+ numbers matched: {e['estimate']:.4%} ({e['exact']:.4%})")
+    s = result["sum"]
+    lines.append(
+        f"Sum of the 6 numbers: mean {s['mean']:.1f}, sd {s['std']:.1f}, "
+        f"90% between {s['p5']} and {s['p95']}"
+    )
+    odd = ", ".join(
+        f"{k}: {e['estimate']:.1%}" for k, e in result["odd_count"].items()
+    )
+    lines.append(f"Odd numbers per draw: {odd}")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Monte Carlo odds and outcome distributions for Mark Six.")
+    parser.add_argument("--draws", type=float, default=1e7, help="draws to simulate (e.g. 1e9)")
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON, help="draws per run")
+    parser.add_argument("--numbers", help="ticket as 6 comma-separated numbers (default: random)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", help="write the full result as JSON")
+    args = parser.parse_args()
+
+    ticket = [int(n) for n in args.numbers.split(",")] if args.numbers else None
+    started = time.perf_counter()
+    try:
+        result = simulate(int(args.draws), args.horizon, ticket, args.seed, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - started
+    print("\n".join(format_summary(result)))
+    print(f"{elapsed:.1f}s ({result['draws'] / elapsed / 1e6:.1f}M draws/s)")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
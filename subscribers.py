@@ -0,0 +1,109 @@
+"""Subscribed chats kept in an append-only file shared by bot instances.
+
+Each change is one JSON line, `{"add": chat_id}` or `{"remove": chat_id}`,
+appended in a single write, so several bot processes (webhook replicas on
+one host, or on a shared volume) can record subscriptions to the same file.
+Every instance replays lines appended by the others before it reads or
+changes the set, so the instance that broadcasts sees all subscribers.
+
+Once the log holds many more lines than subscribers, `remove` rewrites it
+as one line per chat. Appends take a shared lock on a sidecar lock file and
+the rewrite an exclusive one, so no append can land in the replaced file.
+The methods block on file I/O; call them from a thread in async code.
+"""
+
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Set
+
+from draw_store import atomic_write
+
+# Rewrite once the log has this many times more lines than subscribers
+COMPACT_RATIO = 4
+COMPACT_MIN_LINES = 1000
+
+
+class SubscriberLog:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.chats: Set[int] = set()
+        self._lines = 0
+        self._offset = 0
+        self._inode = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _file_lock(self, mode: int) -> Iterator[None]:
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock.fileno(), mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _sync(self) -> None:
+        try:
+            with open(self.path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_ino != self._inode or stat.st_size < self._offset:
+                    # Replaced or truncated: replay from the start
+                    self.chats.clear()
+                    self._inode, self._offset, self._lines = stat.st_ino, 0, 0
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # A line still being written by another process is read next time
+        complete = data[: data.rfind(b"\n") + 1]
+        self._offset += len(complete)
+        for line in complete.splitlines():
+            self._lines += 1
+            try:
+                change = json.loads(line)
+                if "add" in change:
+                    self.chats.add(int(change["add"]))
+                elif "remove" in change:
+                    self.chats.discard(int(change["remove"]))
+            except (ValueError, TypeError, AttributeError):
+                continue
+
+    def _append(self, changes: Iterable[dict]) -> None:
+        data = "".join(json.dumps(c) + "\n" for c in changes).encode("utf-8")
+        if not data:
+            return
+        with self._file_lock(fcntl.LOCK_SH):
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+        self._sync()
+
+    def _compact(self) -> None:
+        with self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+            with atomic_write(self.path) as f:
+                f.writelines(json.dumps({"add": c}) + "\n" for c in sorted(self.chats))
+        self._sync()
+
+    def sync(self) -> Set[int]:
+        """Apply lines appended since the last call; returns the current set."""
+        with self._lock:
+            self._sync()
+            return set(self.chats)
+
+    def add(self, chat_id: int) -> None:
+        with self._lock:
+            self._sync()
+            if chat_id not in self.chats:
+                self._append([{"add": chat_id}])
+
+    def remove(self, chat_ids: Iterable[int]) -> None:
+        with self._lock:
+            self._sync()
+            self._append([{"remove": c} for c in chat_ids if c in self.chats])
+            if self._lines > max(COMPACT_MIN_LINES, COMPACT_RATIO * len(self.chats)):
+                self._compact()
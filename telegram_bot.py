@@ -1,11 +1,13 @@
+import asyncio
 import os
-import random
+import signal
+import time
 from datetime import datetime
+from functools import wraps
 from html import escape as html_escape
-from typing import List, Optional, Dict, Set
+from typing import List, Optional, Dict
+from urllib.parse import urlparse
 
-import pandas as pd
-import requests
 from telegram import (
     Update,
     InlineKeyboardMarkup,
@@ -13,6 +15,7 @@ from telegram import (
 )
 from telegram.constants import ParseMode
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
     CommandHandler,
     ContextTypes,
@@ -22,6 +25,22 @@ from telegram.ext import (
     filters,
 )
 
+from broadcast import Broadcaster
+from combo_index import find_combination
+from combo_pool import CombinationPool
+from csv_mirror import CSVMirror
+from cooccurrence import get_cooccurrence, parse_date
+from draw_store import DrawHistory, get_store
+from entries import evaluate_entry, is_entry_text, parse_entry
+from hkjc_client import HKJC_GRAPHQL_URL, CachedFetch, HKJCClient
+from metrics import Counter, Gauge, Histogram, serve_metrics
+from number_stats import DEFAULT_WINDOW, get_stats
+from partial_search import find_partial_matches
+from prize_checker import check_ticket, check_tickets, parse_tickets
+from simulate import DEFAULT_HORIZON, MAX_HORIZON, format_summary, simulate
+from subscribers import SubscriberLog
+from webhook import WebhookServer
+
 
 CSV_PATH = os.environ.get("MARK6_CSV_PATH", "merged_results.csv")
 CSV_URL = os.environ.get(
@@ -29,7 +48,80 @@ CSV_URL = os.environ.get(
     "https://raw.githubusercontent.com/girafeev1/FortuneTeller/main/merged_results.csv",
 )
 
-HKJC_GRAPHQL_URL = "https://info.cld.hkjc.com/graphql/base/"
+CSV_SYNC_INTERVAL_S = int(os.environ.get("MARK6_CSV_SYNC_INTERVAL_S", "600"))
+CSV_MIN_REVALIDATE_S = int(os.environ.get("MARK6_CSV_MIN_REVALIDATE_S", "60"))
+# Local cached copy of CSV_URL, revalidated with ETag/If-Modified-Since
+csv_mirror = CSVMirror(CSV_URL, CSV_PATH, min_interval=CSV_MIN_REVALIDATE_S)
+
+HKJC_URL = os.environ.get("MARK6_HKJC_URL", HKJC_GRAPHQL_URL)
+HKJC_CACHE_TTL_S = float(os.environ.get("MARK6_HKJC_CACHE_TTL_S", "30"))
+HKJC_CACHE_STALE_S = float(os.environ.get("MARK6_HKJC_CACHE_STALE_S", "300"))
+hkjc_client = HKJCClient(HKJC_URL)
+# Shared by every handler so a burst of /start taps makes one upstream call
+hkjc_draws = CachedFetch(
+    hkjc_client.fetch_draws, ttl=HKJC_CACHE_TTL_S, stale_ttl=HKJC_CACHE_STALE_S
+)
+
+# Prometheus text metrics on a local port; 0 (the default) turns them off
+METRICS_HOST = os.environ.get("MARK6_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("MARK6_METRICS_PORT", "0"))
+HANDLER_SECONDS = Histogram(
+    "mark6_bot_handler_duration_seconds", "Telegram handler latency.", ["handler"]
+)
+HANDLER_ERRORS = Counter(
+    "mark6_bot_handler_errors_total", "Telegram handlers that raised.", ["handler"]
+)
+BROADCAST_SECONDS = Histogram(
+    "mark6_broadcast_duration_seconds",
+    "Time to fan a broadcast out to every subscriber.",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+BROADCAST_MESSAGES = Counter(
+    "mark6_broadcast_messages_total", "Broadcast deliveries by result.", ["result"]
+)
+SUBSCRIBERS = Gauge("mark6_subscribed_chats", "Chats subscribed to draw notifications.")
+HKJC_CACHE = Counter(
+    "mark6_hkjc_cache_lookups_total", "HKJC draw cache lookups by result.", ["result"]
+)
+for _result in hkjc_draws.stats():
+    HKJC_CACHE.set_function(lambda r=_result: hkjc_draws.stats()[r], result=_result)
+
+# Subscribed chats, shared through this file by every instance that can reach it;
+# opened in post_init as bot_data["subscribers"]
+SUBSCRIBERS_PATH = os.environ.get("MARK6_SUBSCRIBERS_PATH", "subscribed_chats.jsonl")
+# Whether this instance runs the draw announcement and reminder job. With
+# several instances, set MARK6_RUN_JOBS=0 on all but one so each broadcast
+# is sent once.
+RUN_JOBS = os.environ.get("MARK6_RUN_JOBS", "1") != "0"
+
+# Webhook mode, used when MARK6_WEBHOOK_URL is set (the public HTTPS URL Telegram
+# posts to); otherwise the bot long-polls. Every instance behind the load
+# balancer must share the same secret and subscribers file.
+WEBHOOK_URL = os.environ.get("MARK6_WEBHOOK_URL", "")
+WEBHOOK_SECRET = os.environ.get("MARK6_WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.environ.get("MARK6_WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("MARK6_WEBHOOK_PORT", "8443"))
+# Updates handled at once in webhook mode
+CONCURRENT_UPDATES = int(os.environ.get("MARK6_CONCURRENT_UPDATES", "32"))
+
+# Upper bound for /generate N, and room left per message for the header line
+MAX_GENERATE_COUNT = 500
+MESSAGE_CHUNK_CHARS = 3500
+
+# Default overlap and how many rows /partial lists
+DEFAULT_PARTIAL_MIN_MATCHES = 3
+MAX_PARTIAL_LINES = 30
+
+# Bulk ticket files sent to the bot
+MAX_TICKET_FILE_BYTES = 1_000_000
+MAX_CHECK_TICKETS = 20000
+
+# /simulate runs off the event loop; the cap keeps a reply within a few seconds
+DEFAULT_SIMULATED_DRAWS = 1_000_000
+MAX_SIMULATED_DRAWS = 5_000_000
+
+# Multiple and banker entries are expanded off the event loop, up to this many lines
+MAX_ENTRY_LINES = 1_000_000
 
 # Minutes before close time to notify users before draw closes
 REMINDER_THRESHOLDS_MIN = [60, 30, 15, 12, 10, 7, 5]
@@ -58,81 +150,18 @@ def get_generate_prompt_html() -> str:
     )
 
 
-def load_data() -> pd.DataFrame:
-    # Prefer online CSV so the bot follows the deployed data
-    try:
-        return pd.read_csv(CSV_URL)
-    except Exception:
-        # Fallback to local file if network/unavailable
-        return pd.read_csv(CSV_PATH)
-
-
-def generate_unique_combination(df: pd.DataFrame) -> List[int]:
-    existing_combinations = set()
-    for _, row in df.iterrows():
-        combination = tuple(
-            sorted(
-                [
-                    row["num_1"],
-                    row["num_2"],
-                    row["num_3"],
-                    row["num_4"],
-                    row["num_5"],
-                    row["num_6"],
-                ]
-            )
-        )
-        existing_combinations.add(combination)
-
-    while True:
-        new_combination = tuple(sorted(random.sample(range(1, 50), 6)))
-        if new_combination not in existing_combinations:
-            return list(new_combination)
-
-
-def find_combination(df: pd.DataFrame, numbers: List[int]) -> Optional[Dict]:
-    search_combination = tuple(sorted(numbers))
-    for _, row in df.iterrows():
-        combination = tuple(
-            sorted(
-                [
-                    row["num_1"],
-                    row["num_2"],
-                    row["num_3"],
-                    row["num_4"],
-                    row["num_5"],
-                    row["num_6"],
-                ]
-            )
-        )
-        if combination == search_combination:
-            return {
-                "date": row["date"],
-                "draw_number": row["draw_number"],
-                "numbers": combination,
-                "bonus": row["bonus"],
-            }
-    return None
-
-
-def get_latest_draw(df: pd.DataFrame) -> Optional[Dict]:
-    if df is None or df.empty:
+def load_data() -> DrawHistory:
+    return get_store(CSV_PATH).load()
+
+
+# Never-drawn combinations ready to send, topped up in the background
+combination_pool = CombinationPool(load_data, size=2 * MAX_GENERATE_COUNT, name="bot")
+
+
+def get_latest_draw(history: DrawHistory) -> Optional[Dict]:
+    if history is None or history.empty:
         return None
-    row = df.iloc[0]
-    numbers = [
-        row["num_1"],
-        row["num_2"],
-        row["num_3"],
-        row["num_4"],
-        row["num_5"],
-        row["num_6"],
-    ]
-    return {
-        "date": row["date"],
-        "draw_number": row["draw_number"],
-        "numbers": numbers,
-        "bonus": row["bonus"],
-    }
+    return history.latest()
 
 
 def parse_numbers(text: str) -> List[int]:
@@ -144,37 +173,10 @@ def parse_numbers(text: str) -> List[int]:
     return nums
 
 
-def fetch_hkjc_draws() -> Optional[Dict]:
-    payload = {
-        "operationName": "marksix",
-        "variables": {},
-        "query": (
-            "fragment lotteryDrawsFragment on LotteryDraw {\n"
-            "  id\n  year\n  no\n  openDate\n  closeDate\n  drawDate\n  status\n"
-            "  snowballCode\n  snowballName_en\n  snowballName_ch\n"
-            "  lotteryPool {\n"
-            "    sell\n    status\n    totalInvestment\n    jackpot\n    unitBet\n"
-            "    estimatedPrize\n    derivedFirstPrizeDiv\n"
-            "    lotteryPrizes { type winningUnit dividend }\n"
-            "  }\n"
-            "  drawResult { drawnNo xDrawnNo }\n"
-            "}\n"
-            "fragment lotteryStatFragment on LotteryStat {\n"
-            "  year\n  no\n  drawDate\n  drawnNumbers { lastDrawnIn totalNumber drawnNo }\n"
-            "}\n"
-            "query marksix {\n"
-            "  lotteryDraws { ...lotteryDrawsFragment }\n"
-            "  lotteryStats { ...lotteryStatFragment }\n"
-            "}\n"
-        ),
-    }
-    try:
-        res = requests.post(HKJC_GRAPHQL_URL, json=payload, timeout=10)
-        res.raise_for_status()
-        data = res.json()
-        return data.get("data", {})
-    except Exception:
-        return None
+async def fetch_hkjc_draws(fresh: bool = False) -> Optional[Dict]:
+    if fresh:
+        return await hkjc_draws.refresh()
+    return await hkjc_draws.get()
 
 
 def get_latest_hkjc_draw(draws: List[Dict]) -> Optional[Dict]:
@@ -223,12 +225,46 @@ def format_currency(val: str) -> str:
         return val
 
 
-def subscribe_chat(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def subscribe_chat(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     chat = update.effective_chat
-    if not chat:
+    subscribers: Optional[SubscriberLog] = context.application.bot_data.get("subscribers")
+    if not chat or subscribers is None:
         return
-    subs: Set[int] = context.application.bot_data.setdefault("subscribed_chats", set())
-    subs.add(chat.id)
+    await asyncio.to_thread(subscribers.add, chat.id)
+
+
+def instrumented(handler):
+    """Record latency and errors of a handler under its function name."""
+    name = handler.__name__
+
+    @wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        started = time.perf_counter()
+        try:
+            await handler(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name)
+
+    return wrapper
+
+
+def chunk_lines(lines: List[str], limit: int = MESSAGE_CHUNK_CHARS) -> List[str]:
+    # Split a long listing across messages without breaking lines
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        if current and size + len(line) + 1 > limit:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
 
 
 def generate_keyboard() -> InlineKeyboardMarkup:
@@ -237,22 +273,50 @@ def generate_keyboard() -> InlineKeyboardMarkup:
     )
 
 
+def generate_prompt_message() -> Dict:
+    return {
+        "text": get_generate_prompt_html(),
+        "parse_mode": ParseMode.HTML,
+        "reply_markup": generate_keyboard(),
+    }
+
+
+async def run_broadcast(application: Application, messages: List[Dict], name: str) -> None:
+    broadcaster: Broadcaster = application.bot_data["broadcaster"]
+    subscribers: SubscriberLog = application.bot_data["subscribers"]
+    # Picks up chats that subscribed through other instances
+    chats = await asyncio.to_thread(subscribers.sync)
+    report = await broadcaster.broadcast(list(chats), messages, name=name)
+    # Drop chats that blocked the bot or no longer exist; follow migrated groups
+    await asyncio.to_thread(subscribers.remove, report.blocked | set(report.migrated))
+    for new_id in report.migrated.values():
+        if new_id not in report.blocked:
+            await asyncio.to_thread(subscribers.add, new_id)
+    application.bot_data["last_broadcast"] = report
+    BROADCAST_SECONDS.observe(report.duration)
+    BROADCAST_MESSAGES.inc(report.sent, result="sent")
+    BROADCAST_MESSAGES.inc(report.failed, result="failed")
+    BROADCAST_MESSAGES.inc(len(report.blocked), result="blocked")
+    print(report.summary())
+
+
+def start_broadcast(application: Application, messages: List[Dict], name: str) -> None:
+    # Run in the background so the draw check job is not held up by the fan-out;
+    # the broadcaster queues it behind any broadcast still being sent
+    application.create_task(run_broadcast(application, messages, name))
+
+
 async def send_generate_prompt(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> None:
     chat = update.effective_chat
     if not chat:
         return
-    await context.bot.send_message(
-        chat_id=chat.id,
-        text=get_generate_prompt_html(),
-        parse_mode=ParseMode.HTML,
-        reply_markup=generate_keyboard(),
-    )
+    await context.bot.send_message(chat_id=chat.id, **generate_prompt_message())
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    subscribe_chat(update, context)
+    await subscribe_chat(update, context)
 
     header = (
         "Iiiiccchh Aaaaaaiiiiiiiiichhhhhh ugggghhhhhhhhhh\n"
@@ -264,7 +328,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
     # Prepare latest draw info (HKJC API)
     latest = None
-    api_data = fetch_hkjc_draws()
+    api_data = await fetch_hkjc_draws()
     draws = api_data.get("lotteryDraws") if api_data else None
     latest = get_latest_hkjc_draw(draws or [])
     next_draw_info = get_next_hkjc_draw(draws or [])
@@ -291,7 +355,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
     # Bubble 3: how to generate (with button attached)
     generate_text = (
-        "Type /generate or\n"
+        "Type /generate (or /generate 10 for several) or\n"
         "Press the Generate button below for a unique combintaion"
     )
     await update.message.reply_text(generate_text, reply_markup=generate_keyboard())
@@ -326,18 +390,17 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     if query.data == "generate":
         # Ensure this chat is subscribed for future draw notifications
-        subscribe_chat(update, context)
-        loading_msg = await query.message.reply_text("Loading...")
+        await subscribe_chat(update, context)
+        # Served from the pool, so the answer goes out without a "Loading..." step
         try:
-            df = load_data()
-            combo = generate_unique_combination(df)
+            combo = combination_pool.take(load_data())[0]
             numbers_str = ", ".join(str(n) for n in combo)
-            await loading_msg.edit_text(
+            await query.message.reply_text(
                 f"Your unique combination is: <b>{escape_html(numbers_str)}</b>",
                 parse_mode=ParseMode.HTML,
             )
         except Exception:
-            await loading_msg.edit_text(
+            await query.message.reply_text(
                 "Sorry, something went wrong while generating a combination. "
                 "Please try again in a moment."
             )
@@ -346,18 +409,41 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 
 async def generate_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    subscribe_chat(update, context)
-    loading_msg = await update.message.reply_text("Loading...")
+    await subscribe_chat(update, context)
+    count = 1
+    if context.args:
+        try:
+            count = int(context.args[0])
+        except ValueError:
+            count = 0
+        if count < 1 or count > MAX_GENERATE_COUNT:
+            await update.message.reply_text(
+                f"Please ask for between 1 and {MAX_GENERATE_COUNT} combinations, e.g.:\n"
+                "/generate 10"
+            )
+            return
+
     try:
-        df = load_data()
-        combo = generate_unique_combination(df)
-        numbers_str = ", ".join(str(n) for n in combo)
-        await loading_msg.edit_text(
-            f"Your unique combination is: <b>{escape_html(numbers_str)}</b>",
-            parse_mode=ParseMode.HTML,
-        )
+        combos = combination_pool.take(load_data(), count)
+        if count == 1:
+            numbers_str = ", ".join(str(n) for n in combos[0])
+            await update.message.reply_text(
+                f"Your unique combination is: <b>{escape_html(numbers_str)}</b>",
+                parse_mode=ParseMode.HTML,
+            )
+        else:
+            lines = [
+                f"{i}. " + ", ".join(str(n) for n in combo)
+                for i, combo in enumerate(combos, start=1)
+            ]
+            chunks = chunk_lines(lines)
+            await update.message.reply_text(
+                f"Your {count} unique combinations are:\n{chunks[0]}"
+            )
+            for chunk in chunks[1:]:
+                await update.message.reply_text(chunk)
     except Exception:
-        await loading_msg.edit_text(
+        await update.message.reply_text(
             "Sorry, something went wrong while generating a combination. "
             "Please try again in a moment."
         )
@@ -366,7 +452,7 @@ async def generate_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
 
 async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    subscribe_chat(update, context)
+    await subscribe_chat(update, context)
     if context.args:
         text = " ".join(context.args)
     else:
@@ -379,6 +465,10 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
 
     loading_msg = await update.message.reply_text("Loading...")
+    if is_entry_text(text):
+        await answer_entry(loading_msg, text)
+        await send_generate_prompt(update, context)
+        return
 
     try:
         numbers = parse_numbers(text)
@@ -388,8 +478,8 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
 
     try:
-        df = load_data()
-        result = find_combination(df, numbers)
+        history = load_data()
+        result = find_combination(history, numbers)
     except Exception:
         await loading_msg.edit_text(
             "Sorry, something went wrong while checking that combination. "
@@ -418,10 +508,318 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     await send_generate_prompt(update, context)
 
 
+async def partial_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await subscribe_chat(update, context)
+    usage = (
+        "Please provide 6 numbers, optionally with a minimum overlap and "
+        "'bonus' to count the extra number, e.g.:\n"
+        "/partial 1 2 3 4 5 6\n"
+        "/partial 1 2 3 4 5 6 k=4 bonus"
+    )
+    min_matches = DEFAULT_PARTIAL_MIN_MATCHES
+    include_bonus = False
+    number_parts = []
+    for arg in context.args or []:
+        lowered = arg.lower()
+        if lowered == "bonus":
+            include_bonus = True
+        elif lowered.startswith("k="):
+            try:
+                min_matches = int(lowered[2:])
+            except ValueError:
+                await update.message.reply_text(usage)
+                return
+        else:
+            number_parts.append(arg)
+
+    try:
+        numbers = parse_numbers(" ".join(number_parts))
+    except ValueError:
+        await update.message.reply_text(usage)
+        return
+    if min_matches < 1 or min_matches > 7:
+        await update.message.reply_text("The minimum overlap must be between 1 and 7.")
+        return
+
+    loading_msg = await update.message.reply_text("Loading...")
+    try:
+        history = load_data()
+        matches = find_partial_matches(
+            history, numbers, min_matches, include_bonus=include_bonus
+        )
+    except ValueError as e:
+        await loading_msg.edit_text(str(e))
+        await send_generate_prompt(update, context)
+        return
+    except Exception:
+        await loading_msg.edit_text(
+            "Sorry, something went wrong while checking that combination. "
+            "Please try again in a moment."
+        )
+        await send_generate_prompt(update, context)
+        return
+
+    header = (
+        f"{len(matches)} draw(s) shared at least {min_matches} number(s) with "
+        f"{', '.join(str(n) for n in sorted(numbers))}"
+        + (", counting the bonus." if include_bonus else ".")
+    )
+    lines = [
+        f"{m['overlap']}{'+B' if m['bonus_matched'] else ''} | {m['date']} "
+        f"(#{m['draw_number']}): {', '.join(str(n) for n in m['matched_numbers'])}"
+        + (f" + bonus {m['bonus']}" if m["bonus_matched"] else "")
+        for m in matches[:MAX_PARTIAL_LINES]
+    ]
+    if len(matches) > MAX_PARTIAL_LINES:
+        lines.append(f"... and {len(matches) - MAX_PARTIAL_LINES} more")
+    await loading_msg.edit_text("\n".join([header] + lines))
+    await send_generate_prompt(update, context)
+
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await subscribe_chat(update, context)
+    history = load_data()
+    number_stats = get_stats(history)
+
+    if context.args:
+        try:
+            detail = number_stats.number(history, int(context.args[0]))
+        except ValueError:
+            await update.message.reply_text(
+                "Send /stats for hot and cold numbers, or /stats 7 for one number."
+            )
+            return
+        lines = [f"<b>Number {detail['number']}</b>"]
+        for kind, label in (("main", "Drawn"), ("bonus", "As extra")):
+            tally = detail[kind]
+            last = tally["last_drawn"]
+            last_str = f"{last['date']} (Draw #{last['draw_number']})" if last else "never"
+            lines.append(
+                f"{label}: {tally['count']} times, {tally['window_count']} in the last "
+                f"{DEFAULT_WINDOW} draws\n"
+                f"  Last: {escape_html(last_str)}\n"
+                f"  Current gap: {tally['current_gap']} draws, longest: {tally['longest_gap']}"
+            )
+        await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML)
+        return
+
+    hot = ", ".join(str(n) for n in number_stats.hot())
+    cold = ", ".join(str(n) for n in number_stats.cold())
+    await update.message.reply_text(
+        f"<b>Over the last {DEFAULT_WINDOW} draws:</b>\n"
+        f"Hot: {hot}\n"
+        f"Cold: {cold}\n"
+        "Send /stats 7 for details on one number.",
+        parse_mode=ParseMode.HTML,
+    )
+
+
+async def together_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await subscribe_chat(update, context)
+    usage = (
+        "How often numbers came out together, optionally since a date:\n"
+        "/together 7 23\n"
+        "/together 7 23 31 since=2020\n"
+        "/together 7  (best partners of 7)\n"
+        "/together since=2020  (top pairs and triples)"
+    )
+    since = None
+    numbers: List[int] = []
+    try:
+        for arg in context.args or []:
+            if arg.lower().startswith("since="):
+                since = parse_date(arg[6:])
+            else:
+                numbers.extend(int(p) for p in arg.replace(",", " ").split())
+        history = load_data()
+        engine = get_cooccurrence(history)
+        period = f" since {since.isoformat()}" if since else ""
+        if len(numbers) == 1:
+            partners = engine.partners(numbers[0], since=since)
+            lines = [f"Most frequent partners of {numbers[0]}{period}:"]
+            lines += [f"{n}: {c} times" for n, c in partners]
+            text = "\n".join(lines)
+        elif numbers:
+            count = engine.count(numbers, since=since)
+            text = (
+                f"{', '.join(str(n) for n in sorted(numbers))} came out together "
+                f"{count} time(s){period}."
+            )
+        else:
+            lines = [f"Top pairs{period}:"]
+            lines += [f"{', '.join(map(str, t['numbers']))}: {t['count']}" for t in engine.top(2, 5, since)]
+            lines.append(f"Top triples{period}:")
+            lines += [f"{', '.join(map(str, t['numbers']))}: {t['count']}" for t in engine.top(3, 5, since)]
+            text = "\n".join(lines)
+    except ValueError:
+        await update.message.reply_text(usage)
+        return
+    await update.message.reply_text(text)
+
+
+def format_division_counts(divisions: Dict[str, int]) -> str:
+    return "\n".join(f"Division {d}: {divisions[d]}" for d in sorted(divisions))
+
+
+async def check_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await subscribe_chat(update, context)
+    try:
+        numbers = parse_numbers(" ".join(context.args or []))
+        result = check_ticket(load_data(), numbers, max_division=4)
+    except ValueError:
+        await update.message.reply_text(
+            "Send 6 numbers to see every prize they would have won, e.g.:\n"
+            "/check 1 2 3 4 5 6\n"
+            "or send a .csv/.json file of tickets to check them all."
+        )
+        return
+
+    lines = [
+        f"Ticket {', '.join(str(n) for n in result['ticket'])} across all past draws:",
+        format_division_counts(result["divisions"]),
+    ]
+    if result["wins"]:
+        # Wins come newest first; a stable sort keeps that order within a division
+        top = sorted(result["wins"], key=lambda w: w["division"])[:MAX_PARTIAL_LINES]
+        lines.append("Top prizes:")
+        lines += [f"Division {w['division']}: {w['date']} (Draw #{w['draw_number']})" for w in top]
+    await update.message.reply_text("\n".join(lines))
+
+
+async def simulate_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await subscribe_chat(update, context)
+    usage = (
+        "Simulate draws to see the odds of a ticket over the next draws, e.g.:\n"
+        "/simulate  (a never-drawn ticket over 100 draws)\n"
+        "/simulate 1 2 3 4 5 6 h=50 n=2000000"
+    )
+    draws, horizon, number_parts = DEFAULT_SIMULATED_DRAWS, DEFAULT_HORIZON, []
+    try:
+        for arg in context.args or []:
+            lowered = arg.lower()
+            if lowered.startswith("n="):
+                draws = int(float(lowered[2:]))
+            elif lowered.startswith("h="):
+                horizon = int(lowered[2:])
+            else:
+                number_parts.append(arg)
+        ticket = parse_numbers(" ".join(number_parts)) if number_parts else None
+    except ValueError:
+        await update.message.reply_text(usage)
+        return
+    if not 1 <= draws <= MAX_SIMULATED_DRAWS or not 1 <= horizon <= MAX_HORIZON:
+        await update.message.reply_text(
+            f"Use n= up to {MAX_SIMULATED_DRAWS:,} draws and h= up to {MAX_HORIZON:,}."
+        )
+        return
+
+    loading_msg = await update.message.reply_text("Simulating...")
+    try:
+        if ticket is None:
+            ticket = combination_pool.take(load_data())[0]
+        result = await asyncio.to_thread(simulate, draws, horizon, ticket)
+    except ValueError as e:
+        await loading_msg.edit_text(str(e))
+        return
+    except Exception:
+        await loading_msg.edit_text(
+            "Sorry, something went wrong while simulating. Please try again in a moment."
+        )
+        return
+    await loading_msg.edit_text("\n".join(format_summary(result)))
+
+
+def format_entry_result(result: Dict) -> str:
+    lines = [
+        f"{result['kind'].capitalize()} entry {result['entry']}: "
+        f"{result['lines']:,} line(s), HK${result['cost']:,}"
+    ]
+    draw = result["draw"]
+    if draw:
+        won = {d: c for d, c in result["divisions"].items() if c}
+        lines.append(f"Against draw #{draw['draw_number']} ({draw['date']}):")
+        lines.append(format_division_counts(won) if won else "No winning lines")
+        lines.append(f"Prizes: HK${result['prizes']:,}")
+    lines.append(f"{result['previously_drawn']} line(s) have been drawn before")
+    lines += [
+        f"{', '.join(map(str, d['line']))}: {d['date']} (Draw #{d['draw_number']})"
+        for d in result["drawn_lines"][:MAX_PARTIAL_LINES]
+    ]
+    return "\n".join(lines)
+
+
+async def answer_entry(loading_msg, text: str) -> None:
+    """Evaluate a multiple or banker entry and edit `loading_msg` with the result."""
+    try:
+        entry = parse_entry(text)
+        if entry.lines > MAX_ENTRY_LINES:
+            raise ValueError(f"That entry has {entry.lines:,} lines; the limit is {MAX_ENTRY_LINES:,}.")
+        result = await asyncio.to_thread(evaluate_entry, load_data(), entry)
+    except ValueError as e:
+        await loading_msg.edit_text(str(e))
+        return
+    except Exception:
+        await loading_msg.edit_text(
+            "Sorry, something went wrong while checking that entry. Please try again in a moment."
+        )
+        return
+    await loading_msg.edit_text(format_entry_result(result))
+
+
+async def entry_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await subscribe_chat(update, context)
+    if not context.args:
+        await update.message.reply_text(
+            "Check every line of a multiple or banker entry against past draws and the last draw, e.g.:\n"
+            "/entry 1 2 3 4 5 6 7 8  (multiple: 28 lines)\n"
+            "/entry 7 21 > 3 11 19 27 35  (bankers before '>': 5 lines)"
+        )
+        return
+    loading_msg = await update.message.reply_text("Loading...")
+    await answer_entry(loading_msg, " ".join(context.args))
+
+
+async def ticket_file_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    document = update.message.document if update.message else None
+    if not document:
+        return
+    name = (document.file_name or "").lower()
+    if not name.endswith((".csv", ".json", ".txt")):
+        return
+    await subscribe_chat(update, context)
+    if document.file_size and document.file_size > MAX_TICKET_FILE_BYTES:
+        await update.message.reply_text("That file is too large; please send up to 1 MB.")
+        return
+
+    loading_msg = await update.message.reply_text("Loading...")
+    try:
+        tg_file = await document.get_file()
+        data = bytes(await tg_file.download_as_bytearray()).decode("utf-8-sig")
+        tickets = parse_tickets(data, "json" if name.endswith(".json") else "csv")
+        if len(tickets) == 0 or len(tickets) > MAX_CHECK_TICKETS:
+            raise ValueError(f"Please send between 1 and {MAX_CHECK_TICKETS} tickets.")
+        history = load_data()
+        report = await asyncio.to_thread(check_tickets, history, tickets, False)
+    except (ValueError, UnicodeDecodeError) as e:
+        await loading_msg.edit_text(f"Could not check that file: {e}")
+        return
+    except Exception:
+        await loading_msg.edit_text(
+            "Sorry, something went wrong while checking those tickets. "
+            "Please try again in a moment."
+        )
+        return
+
+    await loading_msg.edit_text(
+        f"{report['tickets']} ticket(s) across {report['draws']} past draws won:\n"
+        + format_division_counts(report["totals"])
+    )
+
+
 async def nextdraw_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    subscribe_chat(update, context)
+    await subscribe_chat(update, context)
     loading_msg = await update.message.reply_text("Loading...")
-    data = fetch_hkjc_draws()
+    data = await fetch_hkjc_draws()
     if not data:
         await loading_msg.edit_text("Could not reach HKJC at the moment. Please try again.")
         await send_generate_prompt(update, context)
@@ -457,10 +855,14 @@ async def plain_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if not update.message or not update.message.text:
         return
 
-    subscribe_chat(update, context)
+    await subscribe_chat(update, context)
 
     text = update.message.text
     loading_msg = await update.message.reply_text("Loading...")
+    if is_entry_text(text):
+        await answer_entry(loading_msg, text)
+        await send_generate_prompt(update, context)
+        return
 
     try:
         numbers = parse_numbers(text)
@@ -476,8 +878,8 @@ async def plain_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     try:
-        df = load_data()
-        result = find_combination(df, numbers)
+        history = load_data()
+        result = find_combination(history, numbers)
     except Exception:
         await loading_msg.edit_text(
             "Sorry, something went wrong while checking that combination. "
@@ -504,42 +906,117 @@ async def plain_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await send_generate_prompt(update, context)
 
 
+async def run_webhook(application: Application) -> None:
+    """Serve updates posted by Telegram until SIGINT or SIGTERM.
+
+    Mirrors what run_polling does around the application lifecycle. The
+    webhook is registered on every start but left in place on shutdown,
+    since other instances may still be serving it.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    server = WebhookServer(application, urlparse(WEBHOOK_URL).path, WEBHOOK_SECRET)
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await server.start(WEBHOOK_HOST, WEBHOOK_PORT)
+        await application.start()
+        await application.bot.set_webhook(
+            WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+            max_connections=min(100, CONCURRENT_UPDATES),
+        )
+        print(f"Receiving updates for {WEBHOOK_URL} on {WEBHOOK_HOST}:{WEBHOOK_PORT}")
+        await stop.wait()
+    finally:
+        await server.close()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
 def main() -> None:
     token = os.environ.get("TELEGRAM_BOT_TOKEN")
     if not token:
         raise RuntimeError("Please set TELEGRAM_BOT_TOKEN environment variable.")
+    if WEBHOOK_URL and not WEBHOOK_SECRET:
+        raise RuntimeError("Please set MARK6_WEBHOOK_SECRET to use MARK6_WEBHOOK_URL.")
+
+    async def init_draw_state(application: Application) -> None:
+        application.bot_data["broadcaster"] = Broadcaster(application.bot)
+        subscribers = application.bot_data["subscribers"] = SubscriberLog(SUBSCRIBERS_PATH)
+        await asyncio.to_thread(subscribers.sync)
+        SUBSCRIBERS.set_function(lambda: len(subscribers.chats))
+        if METRICS_PORT:
+            application.bot_data["metrics_server"] = await serve_metrics(METRICS_HOST, METRICS_PORT)
+            print(f"Serving metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        load_data()
+        combination_pool.start()
+
+        # Initialize last known draw number and reminders from HKJC API
+        try:
+            api_data = await fetch_hkjc_draws()
+            draws = api_data.get("lotteryDraws") if api_data else None
+            latest = get_latest_hkjc_draw(draws or [])
+            next_draw_init = get_next_hkjc_draw(draws or [])
+            if latest:
+                application.bot_data["last_draw_id"] = latest.get("id")
+            if next_draw_init:
+                application.bot_data["next_draw"] = next_draw_init
+                application.bot_data.setdefault("reminders_sent", {})[
+                    next_draw_init.get("id")
+                ] = set()
+        except Exception:
+            application.bot_data["last_draw_id"] = None
+
+    async def close_connections(application: Application) -> None:
+        await hkjc_client.aclose()
+        await csv_mirror.aclose()
+        combination_pool.stop()
+        server = application.bot_data.pop("metrics_server", None)
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+    application = (
+        ApplicationBuilder()
+        .token(token)
+        .post_init(init_draw_state)
+        .post_shutdown(close_connections)
+        .concurrent_updates(CONCURRENT_UPDATES if WEBHOOK_URL else False)
+        .build()
+    )
 
-    application = ApplicationBuilder().token(token).build()
-
-    # Initialize last known draw number and reminders from HKJC API
-    try:
-        api_data = fetch_hkjc_draws()
-        draws = api_data.get("lotteryDraws") if api_data else None
-        latest = get_latest_hkjc_draw(draws or [])
-        next_draw_init = get_next_hkjc_draw(draws or [])
-        if latest:
-            application.bot_data["last_draw_id"] = latest.get("id")
-        if next_draw_init:
-            application.bot_data["next_draw"] = next_draw_init
-            application.bot_data.setdefault("reminders_sent", {})[
-                next_draw_init.get("id")
-            ] = set()
-    except Exception:
-        application.bot_data["last_draw_id"] = None
-
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("generate", generate_command))
-    application.add_handler(CommandHandler("nextdraw", nextdraw_command))
-    application.add_handler(CommandHandler("search", search_command))
-    application.add_handler(CallbackQueryHandler(button_handler))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, plain_text_handler))
+    application.add_handler(CommandHandler("start", instrumented(start)))
+    application.add_handler(CommandHandler("generate", instrumented(generate_command)))
+    application.add_handler(CommandHandler("nextdraw", instrumented(nextdraw_command)))
+    application.add_handler(CommandHandler("search", instrumented(search_command)))
+    application.add_handler(CommandHandler("partial", instrumented(partial_command)))
+    application.add_handler(CommandHandler("stats", instrumented(stats_command)))
+    application.add_handler(CommandHandler("together", instrumented(together_command)))
+    application.add_handler(CommandHandler("check", instrumented(check_command)))
+    application.add_handler(CommandHandler("simulate", instrumented(simulate_command)))
+    application.add_handler(CommandHandler("entry", instrumented(entry_command)))
+    application.add_handler(CallbackQueryHandler(instrumented(button_handler)))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, instrumented(plain_text_handler)))
+    application.add_handler(MessageHandler(filters.Document.ALL, instrumented(ticket_file_handler)))
 
     # Periodically check for new draws and notify subscribers
     job_queue: JobQueue = application.job_queue
 
     async def check_for_new_draw(context: ContextTypes.DEFAULT_TYPE) -> None:
         try:
-            api_data = fetch_hkjc_draws()
+            # Always go upstream here; this also keeps the cache warm for handlers
+            api_data = await fetch_hkjc_draws(fresh=True)
             draws = api_data.get("lotteryDraws") if api_data else None
         except Exception:
             return
@@ -557,7 +1034,6 @@ def main() -> None:
             current_id = latest.get("id")
             if current_id and current_id != last_draw_id:
                 app.bot_data["last_draw_id"] = current_id
-                subs: Set[int] = app.bot_data.get("subscribed_chats", set())
                 date_str_raw = latest.get("drawDate", "") or ""
                 try:
                     date_str = datetime.fromisoformat(
@@ -574,17 +1050,7 @@ def main() -> None:
                     f"Numbers: {numbers_str}\n"
                     f"Extra:   {bonus}"
                 )
-                for chat_id in subs:
-                    try:
-                        await context.bot.send_message(chat_id=chat_id, text=message)
-                        await context.bot.send_message(
-                            chat_id=chat_id,
-                            text=get_generate_prompt_html(),
-                            parse_mode=ParseMode.HTML,
-                            reply_markup=generate_keyboard(),
-                        )
-                    except Exception:
-                        continue
+                start_broadcast(app, [{"text": message}, generate_prompt_message()], "new draw")
 
         # Store next draw info for reminders
         if next_draw:
@@ -604,39 +1070,51 @@ def main() -> None:
                 now = datetime.now(close_dt.tzinfo)
                 minutes_left = int((close_dt - now).total_seconds() // 60)
                 sent_set = reminders.get(next_draw.get("id"), set())
-                subs: Set[int] = app.bot_data.get("subscribed_chats", set())
-                for thr in REMINDER_THRESHOLDS_MIN:
-                    # Fire once per threshold when we are at or just inside the threshold window.
-                    if minutes_left <= thr and thr not in sent_set:
-                        pool = next_draw.get("lotteryPool", {}) or {}
-                        est_first = format_currency(pool.get("derivedFirstPrizeDiv") or "")
-                        jackpot = format_currency(pool.get("jackpot") or "")
-                        close_display = format_hkjc_dt(next_draw.get("closeDate", ""))
-                        msg = (
-                            f"Reminder: {thr} minutes until Mark 6 draw closes.\n"
-                            f"Draw #{next_draw.get('year','')}/{next_draw.get('no','')} "
-                            f"closes at {close_display}.\n"
-                            f"Estimated 1st Division: HK${est_first}\n"
-                            f"Jackpot: HK${jackpot}"
-                        )
-                        for chat_id in subs:
-                            try:
-                                await context.bot.send_message(chat_id=chat_id, text=msg)
-                                await context.bot.send_message(
-                                    chat_id=chat_id,
-                                    text=get_generate_prompt_html(),
-                                    parse_mode=ParseMode.HTML,
-                                    reply_markup=generate_keyboard(),
-                                )
-                            except Exception:
-                                continue
-                        sent_set.add(thr)
+                # Fire once per threshold when we are at or just inside the threshold window.
+                # Thresholds passed in the same tick (e.g. after a restart) share one
+                # reminder for the closest of them, so chats get a single message.
+                due = [thr for thr in REMINDER_THRESHOLDS_MIN if minutes_left <= thr and thr not in sent_set]
+                if due:
+                    thr = min(due)
+                    pool = next_draw.get("lotteryPool", {}) or {}
+                    est_first = format_currency(pool.get("derivedFirstPrizeDiv") or "")
+                    jackpot = format_currency(pool.get("jackpot") or "")
+                    close_display = format_hkjc_dt(next_draw.get("closeDate", ""))
+                    msg = (
+                        f"Reminder: {thr} minutes until Mark 6 draw closes.\n"
+                        f"Draw #{next_draw.get('year','')}/{next_draw.get('no','')} "
+                        f"closes at {close_display}.\n"
+                        f"Estimated 1st Division: HK${est_first}\n"
+                        f"Jackpot: HK${jackpot}"
+                    )
+                    start_broadcast(
+                        app,
+                        [{"text": msg}, generate_prompt_message()],
+                        f"{thr} min reminder",
+                    )
+                    sent_set.update(due)
                 reminders[next_draw.get("id")] = sent_set
 
     # Check frequently for new draws and reminders
-    job_queue.run_repeating(check_for_new_draw, interval=60, first=5)
+    if RUN_JOBS:
+        job_queue.run_repeating(check_for_new_draw, interval=60, first=5)
+    else:
+        print("MARK6_RUN_JOBS=0: draw announcements and reminders run on another instance.")
+
+    async def refresh_history(context: ContextTypes.DEFAULT_TYPE) -> None:
+        if await csv_mirror.sync():
+            # Parse the new file here rather than in the next user's request
+            await asyncio.to_thread(load_data)
+            # Drop pooled combinations checked against the old history
+            combination_pool.refresh()
 
-    application.run_polling()
+    # Keep the local CSV in step with the published one
+    job_queue.run_repeating(refresh_history, interval=CSV_SYNC_INTERVAL_S, first=0)
+
+    if WEBHOOK_URL:
+        asyncio.run(run_webhook(application))
+    else:
+        application.run_polling()
 
 
 if __name__ == "__main__":
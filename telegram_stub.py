@@ -0,0 +1,145 @@
+"""Local stand-in for the Telegram Bot API, for exercising broadcasts.
+
+It answers `getMe` and `sendMessage`, records every accepted send with its
+arrival time, and throttles like Telegram does: a send that exceeds the
+global rate or comes too soon after the previous one to the same chat gets
+a 429 with `retry_after`. `--fail-rate` answers that share of sends with a
+500, which the bot sees as a generic TelegramError. Point a bot at it with
+
+    python telegram_stub.py --port 8081 --rate 30 --per-chat 1
+    Bot(token, base_url="http://127.0.0.1:8081/bot")
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Stub", "username": "stub_bot"}
+
+
+class FakeBotAPI:
+    """Telegram's send limits and a log of what got through."""
+
+    def __init__(
+        self,
+        rate: float = 30.0,
+        per_chat_interval: float = 1.0,
+        retry_after: int = 1,
+        fail_rate: float = 0.0,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self.rate = rate
+        self.per_chat_interval = per_chat_interval
+        self.retry_after = retry_after
+        self.fail_rate = fail_rate
+        self.rng = rng or random.Random()
+        self.sent: List[Tuple[float, int, str]] = []  # (monotonic time, chat id, text)
+        self.attempts: Dict[int, List[float]] = {}
+        self.throttled = 0
+        self.failed = 0
+        self._recent: Deque[float] = deque()
+        self._last_by_chat: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def send(self, chat_id: int, text: str) -> Tuple[int, Dict]:
+        with self._lock:
+            now = time.monotonic()
+            self.attempts.setdefault(chat_id, []).append(now)
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            too_fast = len(self._recent) >= self.rate
+            too_soon = now - self._last_by_chat.get(chat_id, float("-inf")) < self.per_chat_interval
+            if too_fast or too_soon:
+                self.throttled += 1
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }
+            if self.rng.random() < self.fail_rate:
+                self.failed += 1
+                return 500, {"ok": False, "error_code": 500, "description": "Internal Server Error"}
+            self._recent.append(now)
+            self._last_by_chat[chat_id] = now
+            self.sent.append((now, chat_id, text))
+            return 200, {"ok": True, "result": {
+                "message_id": len(self.sent),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": text,
+            }}
+
+
+def _params(handler: BaseHTTPRequestHandler) -> Dict:
+    body = handler.rfile.read(int(handler.headers.get("Content-Length") or 0)).decode("utf-8")
+    if "json" in (handler.headers.get("Content-Type") or ""):
+        return json.loads(body or "{}")
+    return dict(parse_qsl(body))
+
+
+def make_handler(api: FakeBotAPI):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            method = self.path.rstrip("/").rsplit("/", 1)[-1]
+            params = _params(self)
+            if method == "getMe":
+                self._reply(200, {"ok": True, "result": BOT_USER})
+            elif method == "sendMessage":
+                self._reply(*api.send(int(params["chat_id"]), str(params.get("text", ""))))
+            else:
+                self._reply(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+
+        do_GET = do_POST
+
+        def _reply(self, status: int, data: Dict) -> None:
+            encoded = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+def serve(api: FakeBotAPI, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the stub in a background thread; the bound port is server.server_port."""
+    server = ThreadingHTTPServer((host, port), make_handler(api))
+    threading.Thread(target=server.serve_forever, name="telegram-stub", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API that records and throttles sends.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--rate", type=float, default=30.0, help="sends per second before 429s")
+    parser.add_argument("--per-chat", type=float, default=1.0, help="seconds between sends to one chat")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of sends answered with a 500")
+    args = parser.parse_args()
+
+    api = FakeBotAPI(args.rate, args.per_chat, args.retry_after, args.fail_rate)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(api))
+    print(f"Fake Bot API on http://{args.host}:{args.port}/bot<token>/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"{len(api.sent)} sent, {api.throttled} throttled, {api.failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Broadcaster against telegram_stub's fake Bot API."""
+
+import asyncio
+import random
+
+import pytest
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+from broadcast import Broadcaster
+from telegram_stub import FakeBotAPI, serve
+
+TOKEN = "123:stub"
+
+
+@pytest.fixture
+def fake_api():
+    servers = []
+
+    def start(**kwargs):
+        api = FakeBotAPI(rng=random.Random(0), **kwargs)
+        servers.append(serve(api))
+        return api, servers[-1].server_port
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+async def run_broadcasts(port, chats, messages, broadcasts=1, **kwargs):
+    request = HTTPXRequest(connection_pool_size=16, pool_timeout=10)
+    async with Bot(TOKEN, base_url=f"http://127.0.0.1:{port}/bot", request=request) as bot:
+        broadcaster = Broadcaster(bot, **kwargs)
+        return await asyncio.gather(
+            *(broadcaster.broadcast(chats, messages, f"b{i}") for i in range(broadcasts))
+        )
+
+
+def gaps(times):
+    return [b - a for a, b in zip(times, times[1:])]
+
+
+def test_global_and_per_chat_spacing(fake_api):
+    api, port = fake_api(rate=30, per_chat_interval=0.25)
+    chats = list(range(1, 11))
+    messages = [{"text": "one"}, {"text": "two"}]
+    reports = asyncio.run(
+        run_broadcasts(port, chats, messages, broadcasts=2, rate=20, per_chat_interval=0.3)
+    )
+
+    assert api.throttled == 0
+    assert [r.sent for r in reports] == [20, 20]
+    times = [t for t, _, _ in api.sent]
+    # Paced at 20/s: no one-second window holds more than the limit allows
+    assert all(sum(1 for u in times if t <= u < t + 1.0) <= 21 for t in times)
+    for chat in chats:
+        chat_times = [t for t, c, _ in api.sent if c == chat]
+        assert len(chat_times) == 4
+        # Spacing holds across the two overlapping broadcasts too
+        assert min(gaps(chat_times)) >= 0.25
+        assert [text for _, c, text in api.sent if c == chat] == ["one", "two", "one", "two"]
+
+
+def test_retry_after_pauses_and_delivers(fake_api):
+    api, port = fake_api(rate=5, per_chat_interval=0.0, retry_after=1)
+    chats = list(range(1, 13))
+    (report,) = asyncio.run(
+        run_broadcasts(port, chats, [{"text": "hi"}], rate=100, per_chat_interval=0.0, max_retries=10)
+    )
+
+    assert api.throttled > 0
+    assert report.retries >= api.throttled
+    assert report.sent == len(chats) and report.failed == 0
+    assert sorted(c for _, c, _ in api.sent) == chats
+    # Twelve sends at five per second need at least two retry_after pauses
+    assert report.duration >= 2.0
+
+
+def test_generic_errors_back_off_exponentially(fake_api):
+    api, port = fake_api(per_chat_interval=0.0, fail_rate=1.0)
+    (report,) = asyncio.run(
+        run_broadcasts(
+            port, [7], [{"text": "hi"}], rate=100, per_chat_interval=0.0, max_retries=3, backoff=0.1
+        )
+    )
+
+    assert report.sent == 0 and report.failed == 1 and report.retries == 4
+    attempt_gaps = gaps(api.attempts[7])
+    assert len(attempt_gaps) == 3
+    for i, gap in enumerate(attempt_gaps):
+        assert 0.1 * 2 ** i <= gap < 0.1 * 2 ** i + 0.15
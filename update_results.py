@@ -1,8 +1,21 @@
+import argparse
+import os
+
 import pandas as pd
 import requests
-from datetime import datetime
+from datetime import date, datetime
+
+from draw_store import (
+    atomic_write,
+    columnar_path,
+    export_columnar,
+    file_sha256,
+    history_from_draws,
+    load_history,
+    write_columnar,
+)
+from hkjc_client import HKJC_GRAPHQL_URL, MARKSIX_QUERY
 
-HKJC_GRAPHQL_URL = "https://info.cld.hkjc.com/graphql/base/"
 DB_FILE = "merged_results.csv"
 EXPECTED_COLUMNS = [
     "date",
@@ -19,29 +32,7 @@ EXPECTED_COLUMNS = [
 
 def fetch_hkjc_draws():
     """Fetch recent Mark Six draws from the official HKJC GraphQL endpoint."""
-    payload = {
-        "operationName": "marksix",
-        "variables": {},
-        "query": (
-            "fragment lotteryDrawsFragment on LotteryDraw {\n"
-            "  id\n  year\n  no\n  openDate\n  closeDate\n  drawDate\n  status\n"
-            "  snowballCode\n  snowballName_en\n  snowballName_ch\n"
-            "  lotteryPool {\n"
-            "    sell\n    status\n    totalInvestment\n    jackpot\n    unitBet\n"
-            "    estimatedPrize\n    derivedFirstPrizeDiv\n"
-            "    lotteryPrizes { type winningUnit dividend }\n"
-            "  }\n"
-            "  drawResult { drawnNo xDrawnNo }\n"
-            "}\n"
-            "fragment lotteryStatFragment on LotteryStat {\n"
-            "  year\n  no\n  drawDate\n  drawnNumbers { lastDrawnIn totalNumber drawnNo }\n"
-            "}\n"
-            "query marksix {\n"
-            "  lotteryDraws { ...lotteryDrawsFragment }\n"
-            "  lotteryStats { ...lotteryStatFragment }\n"
-            "}\n"
-        ),
-    }
+    payload = {"operationName": "marksix", "variables": {}, "query": MARKSIX_QUERY}
     try:
         res = requests.post(HKJC_GRAPHQL_URL, json=payload, timeout=10)
         res.raise_for_status()
@@ -57,29 +48,36 @@ def format_draw_number(year: str, no: int) -> str:
     return f"{year_short}/{no}"
 
 
-def update_database():
-    # 1. Read the existing database and find the last draw number
+def draw_key(draw_number):
+    """(year, number) for a stored draw number; '25/099' and '25/99' are the same draw."""
+    year, _, number = str(draw_number).partition("/")
+    return (int(year), int(number))
+
+
+def safe_draw_key(draw_number):
+    """draw_key, or None for a malformed draw number."""
     try:
-        db_df = pd.read_csv(DB_FILE)
-        existing_draw_numbers = set(db_df["draw_number"]) if not db_df.empty else set()
-    except FileNotFoundError:
-        db_df = pd.DataFrame()
-        existing_draw_numbers = set()
+        return draw_key(draw_number)
+    except (TypeError, ValueError):
+        return None
 
-    if not db_df.empty:
-        db_df = db_df[[col for col in EXPECTED_COLUMNS if col in db_df.columns]].copy()
-        if "draw_number" in db_df.columns:
-            db_df = db_df[db_df["draw_number"].notna()]
 
-    # 2. Fetch draws from HKJC
-    print("Fetching latest results from HKJC...")
-    draws = fetch_hkjc_draws()
+def normalize_draw_date(raw):
+    """'YYYY-MM-DD' from an HKJC drawDate, or None if it has no usable date."""
+    raw = str(raw or "")
+    try:
+        return datetime.fromisoformat(raw.replace("Z", "+00:00")).strftime("%Y-%m-%d")
+    except ValueError:
+        pass
+    try:
+        # e.g. '2025-01-02+08:00', a date with an offset but no time
+        return date.fromisoformat(raw[:10]).isoformat()
+    except ValueError:
+        return None
 
-    if not draws:
-        print("No data from HKJC. Aborting update.")
-        return
 
-    # 3. Build a dataframe for new results (only status=Result and not already in DB)
+def build_new_records(draws, existing_draw_numbers):
+    existing_keys = {safe_draw_key(n) for n in existing_draw_numbers} - {None}
     records = []
     for d in draws:
         status = (d.get("status") or "").lower()
@@ -88,19 +86,18 @@ def update_database():
         draw_no = d.get("no")
         year = d.get("year")
         draw_number = format_draw_number(year, draw_no)
-        if draw_number in existing_draw_numbers:
+        key = safe_draw_key(draw_number)
+        if key is None or key in existing_keys:
             continue
-        draw_date_raw = d.get("drawDate", "") or ""
-        try:
-            draw_date = datetime.fromisoformat(draw_date_raw.replace("Z", "+00:00")).strftime(
-                "%Y-%m-%d"
-            )
-        except Exception:
-            draw_date = draw_date_raw
-        nums = d.get("drawResult", {}).get("drawnNo") or []
-        if len(nums) < 6:
+        draw_date = normalize_draw_date(d.get("drawDate"))
+        if draw_date is None:
+            print(f"Skipping draw {draw_number}: unreadable draw date {d.get('drawDate')!r}")
             continue
+        existing_keys.add(key)
+        nums = d.get("drawResult", {}).get("drawnNo") or []
         bonus = d.get("drawResult", {}).get("xDrawnNo")
+        if len(nums) < 6 or bonus is None:
+            continue
         records.append(
             {
                 "date": draw_date,
@@ -114,6 +111,111 @@ def update_database():
                 "bonus": bonus,
             }
         )
+    return records
+
+
+def format_changelog(records):
+    lines = [f"Added {len(records)} draw(s):"]
+    for r in records:
+        nums = ", ".join(str(r[f"num_{i}"]) for i in range(1, 7))
+        lines.append(f"  {r['draw_number']} {r['date']}: {nums} + {r['bonus']}")
+    return "\n".join(lines)
+
+
+def prepend_rows(path, records):
+    """Atomically write `records` (newest first) above the existing data rows.
+
+    The existing rows are copied through as bytes; nothing is re-parsed.
+    """
+    with open(path, "r", newline="") as src, atomic_write(path, newline="") as dst:
+        header = src.readline()
+        dst.write(header)
+        for r in records:
+            dst.write(",".join(str(r[col]) for col in EXPECTED_COLUMNS) + "\n")
+        while True:
+            chunk = src.read(1 << 16)
+            if not chunk:
+                break
+            dst.write(chunk)
+
+
+def update_database_incremental(draws=None, path=None):
+    """Add only draws not yet in `path` (DB_FILE by default); existing rows stay untouched.
+
+    The draw-number index comes from the memory-mapped columnar companion,
+    and the companion is extended rather than rebuilt. Falls back to a full
+    rebuild when the new draws do not all sort before the existing ones.
+    `draws` skips the HKJC fetch when the results are already at hand.
+    """
+    path = path or DB_FILE
+    if not os.path.exists(path):
+        return update_database(draws, path)
+    history = load_history(path, rebuild=True)
+    existing_draw_numbers = set(history.draw_numbers)
+
+    if draws is None:
+        print("Fetching latest results from HKJC...")
+        draws = fetch_hkjc_draws()
+    if not draws:
+        print("No data from HKJC. Aborting update.")
+        return
+
+    records = build_new_records(draws, existing_draw_numbers)
+    if not records:
+        print("No new results found.")
+        return
+    records.sort(key=lambda r: r["date"], reverse=True)
+
+    latest = history.latest()
+    if latest and any(r["date"] <= latest["date"] for r in records):
+        print("New draws are older than the latest stored draw; rebuilding in full.")
+        return update_database(draws, path)
+
+    prepend_rows(path, records)
+    added = history_from_draws(
+        [
+            {
+                "date": r["date"],
+                "draw_number": r["draw_number"],
+                "numbers": [r[f"num_{i}"] for i in range(1, 7)],
+                "bonus": r["bonus"],
+            }
+            for r in records
+        ]
+    )
+    updated = history.with_new_draws(added, source_hash=file_sha256(path))
+    write_columnar(updated, columnar_path(path))
+
+    print(format_changelog(records))
+    print(f"Database updated successfully. Total records: {len(updated)}")
+
+
+def update_database(draws=None, path=None):
+    path = path or DB_FILE
+    # 1. Read the existing database and find the last draw number
+    try:
+        db_df = pd.read_csv(path)
+        existing_draw_numbers = set(db_df["draw_number"]) if not db_df.empty else set()
+    except FileNotFoundError:
+        db_df = pd.DataFrame()
+        existing_draw_numbers = set()
+
+    if not db_df.empty:
+        db_df = db_df[[col for col in EXPECTED_COLUMNS if col in db_df.columns]].copy()
+        if "draw_number" in db_df.columns:
+            db_df = db_df[db_df["draw_number"].notna()]
+
+    # 2. Fetch draws from HKJC, unless given
+    if draws is None:
+        print("Fetching latest results from HKJC...")
+        draws = fetch_hkjc_draws()
+
+    if not draws:
+        print("No data from HKJC. Aborting update.")
+        return
+
+    # 3. Build a dataframe for new results (only status=Result and not already in DB)
+    records = build_new_records(draws, existing_draw_numbers)
 
     if not records:
         print("No new results found.")
@@ -128,15 +230,33 @@ def update_database():
         if col not in combined_df.columns:
             combined_df[col] = None
     combined_df = combined_df[EXPECTED_COLUMNS]
-    combined_df.drop_duplicates(subset=["draw_number"], keep="first", inplace=True)
+    combined_df["key"] = combined_df["draw_number"].map(safe_draw_key)
+    malformed = combined_df["key"].isna()
+    if malformed.any():
+        print(f"Dropping {int(malformed.sum())} row(s) with a malformed draw number.")
+    combined_df = combined_df[~malformed]
+    combined_df = combined_df.drop_duplicates(subset=["key"], keep="first").drop(columns=["key"])
 
     # 5. Sort and save
     combined_df["date"] = pd.to_datetime(combined_df["date"], errors="coerce")
     combined_df = combined_df.sort_values(by="date", ascending=False, na_position="last")
-    combined_df.to_csv(DB_FILE, index=False)
+    with atomic_write(path, newline="") as f:
+        combined_df.to_csv(f, index=False)
+    bin_file = export_columnar(path)
 
     print(f"Database updated successfully. Total records: {len(combined_df)}")
+    print(f"Columnar copy written to {bin_file}")
 
 
 if __name__ == "__main__":
-    update_database()
+    parser = argparse.ArgumentParser(description="Update merged_results.csv from HKJC.")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="re-read, de-duplicate, re-sort and rewrite the whole file",
+    )
+    args = parser.parse_args()
+    if args.full:
+        update_database()
+    else:
+        update_database_incremental()
@@ -0,0 +1,214 @@
+"""Receive Telegram updates over HTTPS webhooks instead of long polling.
+
+`WebhookServer` is a small asyncio HTTP server: Telegram's POSTs to the
+webhook path are checked against the secret token and put on the
+application's update queue, which the application processes concurrently.
+`/healthz` answers load balancer checks. Metrics are not served here, since
+this listener is public; they stay on the bot's local MARK6_METRICS_PORT.
+TLS is left to the load balancer or reverse proxy in front.
+
+Run as a script, it posts fake updates to a running server for local checks:
+
+    python webhook.py --url http://127.0.0.1:8443/telegram --secret s3cret --count 200 --text "1 2 3 4 5 6"
+"""
+
+import argparse
+import asyncio
+import hmac
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from telegram import Update
+
+from metrics import Counter
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+MAX_BODY_BYTES = 1 << 20  # Telegram updates are a few KB
+IDLE_TIMEOUT_S = 75.0  # kept-alive connections idle longer than this are closed
+
+WEBHOOK_REQUESTS = Counter(
+    "mark6_webhook_requests_total", "Webhook HTTP requests by result.", ["result"]
+)
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 503: "Service Unavailable",
+}
+
+Response = Tuple[int, bytes, str]
+
+
+def _json(status: int, data: Dict) -> Response:
+    return status, json.dumps(data).encode("utf-8"), "application/json"
+
+
+class WebhookServer:
+    """Feeds webhook POSTs to `application.update_queue`.
+
+    Requests are answered as soon as the update is queued, so a slow handler
+    never holds up Telegram's delivery; how many updates are processed at
+    once is set with ApplicationBuilder.concurrent_updates. Connections are
+    kept alive between requests.
+    """
+
+    def __init__(self, application: Any, path: str, secret: str) -> None:
+        if not secret:
+            raise ValueError("A webhook needs a secret token.")
+        self.application = application
+        self.path = path or "/"
+        self._secret = secret.encode("utf-8")
+        self.updates = 0
+        self.last_update_at: Optional[float] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str, port: int) -> None:
+        self._server = await asyncio.start_server(self._handle, host, port)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def health(self) -> Response:
+        running = getattr(self.application, "running", True)
+        age = time.monotonic() - self.last_update_at if self.last_update_at else None
+        return _json(200 if running else 503, {
+            "status": "ok" if running else "starting",
+            "updates": self.updates,
+            "queued": self.application.update_queue.qsize(),
+            "last_update_age_s": round(age, 3) if age is not None else None,
+        })
+
+    async def receive(self, headers: Dict[str, str], body: bytes) -> Response:
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, "").encode("utf-8"), self._secret):
+            WEBHOOK_REQUESTS.inc(result="forbidden")
+            return 403, b"", "text/plain"
+        try:
+            data = json.loads(body)
+            if not isinstance(data, dict) or "update_id" not in data:
+                raise ValueError("not an update")
+            update = Update.de_json(data, getattr(self.application, "bot", None))
+        except (ValueError, TypeError, KeyError):
+            WEBHOOK_REQUESTS.inc(result="bad_request")
+            return 400, b"", "text/plain"
+        await self.application.update_queue.put(update)
+        self.updates += 1
+        self.last_update_at = time.monotonic()
+        WEBHOOK_REQUESTS.inc(result="accepted")
+        return 200, b"", "text/plain"
+
+    async def route(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Response:
+        if path == "/healthz":
+            return self.health() if method in ("GET", "HEAD") else (405, b"", "text/plain")
+        if path == self.path:
+            return await self.receive(headers, body) if method == "POST" else (405, b"", "text/plain")
+        WEBHOOK_REQUESTS.inc(result="not_found")
+        return 404, b"", "text/plain"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), timeout=IDLE_TIMEOUT_S)
+                if not request_line:
+                    break
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3:
+                    break
+                method, target, version = parts
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), timeout=10)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    WEBHOOK_REQUESTS.inc(result="too_large")
+                    await self._respond(writer, 413, b"", "text/plain", keep_alive=False)
+                    break
+                body = await asyncio.wait_for(reader.readexactly(length), timeout=10) if length else b""
+                status, payload, content_type = await self.route(method, target.split("?")[0], headers, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, b"" if method == "HEAD" else payload, content_type, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(
+        writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str, keep_alive: bool
+    ) -> None:
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            .encode("ascii") + body
+        )
+        await writer.drain()
+
+
+def fake_update(update_id: int, text: str, chat_id: int) -> Dict:
+    """A private-chat message update as Telegram would send it."""
+    message: Dict[str, Any] = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private", "first_name": "Test"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+async def post_updates(url: str, secret: str, text: str, count: int, concurrency: int, chats: int) -> Dict:
+    """POST `count` fake updates to `url`, `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses: Dict[int, int] = {}
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency)) as client:
+
+        async def post(i: int) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                res = await client.post(
+                    url, json=fake_update(i, text, 1000 + i % chats), headers={SECRET_HEADER: secret}
+                )
+                latencies.append(time.perf_counter() - started)
+                statuses[res.status_code] = statuses.get(res.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(i) for i in range(1, count + 1)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "statuses": statuses,
+        "seconds": elapsed,
+        "per_second": count / elapsed if elapsed else 0.0,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Post fake Telegram updates to a webhook server.")
+    parser.add_argument("--url", default="http://127.0.0.1:8443/telegram")
+    parser.add_argument("--secret", required=True)
+    parser.add_argument("--text", default="/start")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--chats", type=int, default=1, help="spread updates over this many chat ids")
+    args = parser.parse_args()
+    result = asyncio.run(post_updates(args.url, args.secret, args.text, args.count, args.concurrency, args.chats))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()